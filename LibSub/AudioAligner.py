@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Coarse, speech-to-text-free alignment of subtitles to a video:
+  - the audio is reduced to a speech-activity envelope (one bit per
+    FRAME_MS frame, set if "loud"),
+  - the subtitles are reduced to a caption on/off envelope (likewise),
+  - the offset (and rate, from a short list of likely rates) is the
+    one which best correlates the two.
+The envelopes are kept as (big) ints so that each trial lag is just a
+shift/and/popcount done at C speed; so, a two hour video is
+correlated over +/- max-offset in a small fraction of a second
+(i.e., decoding the audio is the only real cost).
+
+The result is good to about a frame and only finds a constant offset
+and rate; so, it serves to pre-shift subs or to decide that a full
+reference (i.e., speech-to-text) is not needed.
+
+Likewise, the speech-activity envelope of a video serves as a compact
+audio fingerprint; matching the fingerprints of two releases of the same
+video gives the mapping of the times of one onto the other (e.g., so a
+reference made for a replaced release can be reused).
+"""
+# pylint: disable=import-outside-toplevel,broad-except,too-many-locals
+import os
+import sys
+import math
+import shlex
+import json
+import subprocess
+from array import array
+from types import SimpleNamespace
+from LibGen.CustLogger import CustLogger as lg
+from LibSub import ConfigSubshop
+
+
+def popcount(value):
+    """Count the one bits of a non-negative int."""
+    return value.bit_count() if hasattr(value, 'bit_count') else bin(value).count('1')
+
+
+class AudioAligner:
+    """Aligns a CaptionList to the audio of a video by correlating the
+    speech-activity and caption-activity envelopes."""
+    FRAME_MS = 100
+    SAMPLE_RATE = 16000
+    FRAME_BYTES = SAMPLE_RATE * 2 * FRAME_MS // 1000
+    params = ConfigSubshop.get_params()
+
+    def __init__(self, video, stream):
+        self.video = video
+        self.stream = stream
+        self.levels = None  # audio level per frame (once decoded)
+
+    def get_levels(self):
+        """Decode the audio stream and compute the level of each frame (i.e., the
+        mean |sample| of every 4th sample).  Returns: the levels or None if
+        ffmpeg fails."""
+        if self.levels is not None:
+            return self.levels
+        cmd = ['ffmpeg', '-nostdin', '-nostats', '-hide_banner', '-loglevel', 'error',
+                '-i', self.video, '-map', self.stream, '-ar', str(self.SAMPLE_RATE),
+                '-ac', '1', '-f', 's16le', '-']
+        lg.db('cmd:', ' '.join(shlex.quote(arg) for arg in cmd))
+        levels, frame_bytes = array('f'), self.FRAME_BYTES
+        with subprocess.Popen(cmd, stdout=subprocess.PIPE) as ffmpeg:
+            while True:
+                block = ffmpeg.stdout.read(frame_bytes * 100)
+                if not block:
+                    break
+                samples = array('h', block[:len(block) & ~1])
+                if sys.byteorder == 'big':
+                    samples.byteswap()
+                step = frame_bytes // 2
+                for beg in range(0, len(samples), step):
+                    frame = samples[beg:beg+step:4]
+                    levels.append(sum(map(abs, frame)) / len(frame))
+            rv = ffmpeg.wait()
+        if rv:
+            lg.err(f'ffmpeg returned {rv} for {self.video!r}')
+            return None
+        self.levels = levels
+        return levels
+
+    def speech_envelope(self, density):
+        """Return the speech-activity envelope as an int (bit N is frame N).
+        Lacking a real VAD, frames are "speech" if louder than the level
+        that makes the envelope as dense as the captions (since, when
+        aligned, most talking is captioned and vice versa)."""
+        levels = self.get_levels()
+        if not levels:
+            return 0, 0
+        density = min(max(density, 0.10), 0.90)
+        threshold = sorted(levels)[int(len(levels) * (1 - density))]
+        bits = ''.join('1' if level > threshold else '0' for level in reversed(levels))
+        return int(bits, 2), len(levels)
+
+    @staticmethod
+    def caption_envelope(caplist, rate=1.0, frame_ms=None):
+        """Return the caption on/off envelope as an int (bit N is frame N) with
+        the caption times scaled by rate."""
+        frame_ms = frame_ms if frame_ms else AudioAligner.FRAME_MS
+        envelope = 0
+        for caption in caplist.captions:
+            beg = max(int(caption.beg_ms * rate) // frame_ms, 0)
+            end = max(int(caption.end_ms * rate) // frame_ms, beg + 1)
+            envelope |= ((1 << (end - beg)) - 1) << beg
+        return envelope
+
+    @staticmethod
+    def correlate(speech, speech_cnt, captions, max_lag):
+        """Score each lag in [-max_lag, max_lag] as the count of frames with both
+        speech and captions (with captions shifted by lag) less the count
+        expected by chance.  Returns: [(score, lag), ...]"""
+        mask = (1 << speech_cnt) - 1
+        speech_ones = popcount(speech)
+        scores = []
+        for lag in range(-max_lag, max_lag + 1):
+            shifted = (captions << lag if lag >= 0 else captions >> -lag) & mask
+            ones = popcount(shifted)
+            both = popcount(speech & shifted)
+            scores.append((both - speech_ones * ones / speech_cnt, lag))
+        return scores
+
+    def get_fingerprint(self):
+        """Return the audio fingerprint (i.e., the speech envelope w the median
+        level as threshold) as a namespace w bits and count; None if no audio."""
+        bits, count = self.speech_envelope(0.5)
+        return SimpleNamespace(bits=bits, count=count) if count else None
+
+    @staticmethod
+    def save_fingerprint(path, fprint):
+        """Write a fingerprint to a file (as compact JSON)."""
+        with open(path + '.tmp', 'w', encoding='utf-8') as fh:
+            json.dump({'frame_ms': AudioAligner.FRAME_MS, 'count': fprint.count,
+                    'bits': f'{fprint.bits:x}'}, fh)
+        os.replace(path + '.tmp', path)
+
+    @staticmethod
+    def load_fingerprint(path):
+        """Read a fingerprint file.  Returns: the fingerprint or None if missing,
+        corrupt, or of another frame size."""
+        try:
+            with open(path, 'r', encoding='utf-8') as fh:
+                obj = json.load(fh)
+            if obj['frame_ms'] != AudioAligner.FRAME_MS:
+                return None
+            return SimpleNamespace(bits=int(obj['bits'], 16), count=int(obj['count']))
+        except Exception as exc:
+            lg.db(f'cannot load fingerprint {path!r}: {exc}')
+            return None
+
+    @staticmethod
+    def match_fingerprints(old, new, rates=None, max_offset_ms=None):
+        """Find the offset/rate that best maps the times of the old fingerprint
+        onto the new one (i.e., new_ms = old_ms*rate + offset_ms).
+        Returns: same as align()."""
+        sync_params = AudioAligner.params.sync_params
+        rates = rates if rates else sync_params.audio_sync_rates
+        max_offset_ms = max_offset_ms if max_offset_ms else sync_params.max_offset
+        old_bits = f'{old.bits:0{old.count}b}'[::-1] # bit N is frame N
+        trials = []
+        for rate in rates:
+            scaled = ''.join(old_bits[int(idx / rate)]
+                    for idx in range(int(old.count * rate)))
+            trials.append((rate, int(scaled[::-1], 2) if scaled else 0))
+        return AudioAligner.best_alignment(new.bits, new.count, trials,
+                max_offset_ms // AudioAligner.FRAME_MS)
+
+    @staticmethod
+    def best_alignment(speech, speech_cnt, trials, max_lag):
+        """Correlate each trial envelope (i.e., [(rate, envelope), ...]) with the
+        speech envelope and pick the best rate and lag.  Returns: as align()."""
+        best = None
+        for rate, envelope in trials:
+            scores = AudioAligner.correlate(speech, speech_cnt, envelope, max_lag)
+            peak, lag = max(scores)
+            lg.tr1(f'rate={rate} lag={lag} peak={peak:.1f}')
+            if best is None or peak > best[0]:
+                best = (peak, lag, rate, scores)
+
+        peak, lag, rate, scores = best
+        # the other lags (i.e., not the peak or its shoulders) give the noise level
+        others = [score for score, olag in scores if abs(olag - lag) > 10]
+        mean = sum(others) / len(others) if others else 0
+        stdev = (math.sqrt(sum((score - mean)**2 for score in others) / len(others))
+                if others else 0)
+        score = round((peak - mean) / stdev, 1) if stdev else 0.0
+        offset_ms = lag * AudioAligner.FRAME_MS
+        return SimpleNamespace(offset_ms=offset_ms, rate=rate, score=score,
+                intercept=offset_ms, slope=rate - 1.0)
+
+    def align(self, caplist, rates=None, max_offset_ms=None):
+        """Find the offset/rate that best maps the caplist onto the audio (i.e.,
+        new_ms = ms*rate + offset_ms).
+        Returns: None if no audio, else namespace with
+            - offset_ms, rate - the best mapping
+            - score - how many stdevs the best peak stands above the other lags
+            - intercept, slope - the mapping in linear regression terms
+        """
+        sync_params = self.params.sync_params
+        rates = rates if rates else sync_params.audio_sync_rates
+        max_offset_ms = max_offset_ms if max_offset_ms else sync_params.max_offset
+        if not caplist.captions:
+            return None
+        span_ms = caplist.captions[-1].end_ms - caplist.captions[0].beg_ms
+        capt_ms = sum(cap.end_ms - cap.beg_ms for cap in caplist.captions)
+        speech, speech_cnt = self.speech_envelope(capt_ms / max(span_ms, 1))
+        if not speech_cnt:
+            return None
+
+        trials = [(rate, self.caption_envelope(caplist, rate)) for rate in rates]
+        return self.best_alignment(speech, speech_cnt, trials,
+                max_offset_ms // self.FRAME_MS)
+
+
+def runner(argv):
+    """
+    AudioAligner.py [H,S]: aligns subtitles to a video by correlating speech activity
+    with caption activity (i.e., w/o speech-to-text).  Its runner() shows the offset/rate
+    found and, optionally, writes the adjusted subtitles.
+    """
+    import argparse
+    from LibSub.SubFixer import CaptionList, Caption
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-s', '--stream', default='0:a:0',
+            help='audio stream to use [dflt=0:a:0]')
+    parser.add_argument('-o', '--out-file',
+            help='write the adjusted subtitles to this file')
+    parser.add_argument('-V', '--log-level', choices=lg.choices,
+        default='INFO', help='set logging/verbosity level [dflt=INFO]')
+    parser.add_argument('video', help='video file')
+    parser.add_argument('srt', help='subtitle file')
+    opts = parser.parse_args(argv)
+    lg.setup(level=opts.log_level)
+
+    with open(opts.srt, 'r', encoding='utf-8', errors='ignore') as srt:
+        caplist = CaptionList(srt)
+    result = AudioAligner(opts.video, opts.stream).align(caplist)
+    if not result:
+        lg.err(f'cannot align {os.path.basename(opts.srt)!r}')
+        return
+    lg.pr(f'offset={result.offset_ms/1000:.1f}s rate={result.rate}'
+            f' score={result.score}')
+    if opts.out_file:
+        caplist.adjust_subs(result)
+        Caption.write_to_file(opts.out_file, caplist.captions)
@@ -25,11 +25,35 @@ SUBSHOP_TEMPLATE=r'''
 - reference-tool: video2srt # autosub or video2srt
 - speech-to-text-params: !!omap
   - thread-cnt: 0 # computed if not set positive to roughly 75% of cpu count
+  - chunk-secs: 30 # target seconds of audio per recognition job (streamed from ffmpeg)
+  - silence-level: 64 # audio with mean |sample| below this is silent (of 32768)
+  - min-silence-secs: 2.0 # silences at least this long are skipped and split jobs
+  - progressive: false # when syncing, transcribe only enough of the video to fit
+  - window-secs: 60 # progressive: seconds of audio per window transcribed
+  - min-fit-pts: 200 # progressive: matched points needed to stop early
+  - converged-ms: 40 # progressive: stop early when fit moves less than this
+  - checkpoint-secs: 300 # seconds of audio per checkpoint (so an interrupted run resumes)
+  - batch-size: 10 # "ref" makes references of up to this many videos in one video2srt run
+- audio-cache-params: !!omap  # cache of decoded audio (as 16kHz mono FLAC) in .cache folders
+  - enabled: false # if true, audio work decodes the cached audio, not the video
+  - max-mb: 4000 # total size of all cached audio; least recently used is evicted
+- release-swap-params: !!omap  # to reuse the reference of a replaced release of a video
+  - enabled: true # on a swap (old release still on disk), match audio and map the reference
+  - min-score: 8.0 # min fingerprint match score (stdevs above the other offsets)
+- reference-params: !!omap  # to control trusting subs as the reference (vs speech-to-text)
+  - trusted-sources: # in order of preference; remove all to always use speech-to-text
+    - EMBEDDED # the internal subs (extracted to the cache)
+    # - TORRENT # opt-in: the subs that came with the video (unless they are being synced)
+    - SCORED # the prior subs if well-scored (when syncing others)
+  - max-score: 5 # SCORED: trust only subs scored at most this
+  - min-caps-per-hour: 300 # quality gate: min captions per hour of video
+  - min-coverage: 0.70 # quality gate: min fraction of the video spanned by captions
 - cmd-opts-defaults: !!omap  # subshop command defaults
   - search-using-plex: false # search for videos w plex (if configured)?
   - redos-cache-limit: 4 # auto redos stops when cached subs reaches limit
   - auto-retry-max-days: 30.0 # auto dos/redos max retry interval in days
   - defer-redos-sub-cnt: 3 # begin AUTODEFER redos when this many downloaads
+  - jobs: 1 # default --jobs (videos handled at once) for sync/anal/dos/redos
 - plex-query-params: !!omap  # PlexApi options
   - plex-path-adj: "" # set -/{prefix} and/or +/{prefix} to make local path
   - warn-if-nonexistent: false # warn for non-existent paths (can be just noise)
@@ -66,6 +90,19 @@ SUBSHOP_TEMPLATE=r'''
   - min-dev: 350 # min required rate change (ms)
   - min-offset: 100 # min required offset (ms)
   - min-ref-pts: 40 # minimum number of points
+  # NOTE: audio-sync aligns subs to speech activity (no reference); it is tried before
+  # making a reference and, if its score is met, no reference is made
+  - audio-sync: false # try audio-sync before making a reference
+  - audio-sync-min-score: 6.0 # min peak score (in stdevs) to trust audio-sync
+  - audio-sync-srt-score: 12 # srt score recorded for audio-synced subs (coarse; so redos-able)
+  - audio-sync-rates: # rates to try (e.g., 25/23.976 fps and 24/23.976 fps and inverses)
+    - 1.0
+    - 1.04271
+    - 0.95904
+    - 1.001
+    - 0.999
+    - 1.04167
+    - 0.96
 - phrase-params: !!omap # phrase complexity tuning params
   - min_word_len: 5 # match phrase must have word of this length
   - min_str_len: 8 # match phrase string length must be this long
@@ -79,6 +116,8 @@ SUBSHOP_TEMPLATE=r'''
   - max-dev-frac: 1.25    # how much worse dev either break seg can be
   - trial-mins: 12.0       # (nominal) minutes in each trial segment
   - min-trial-segs: 3     # minimum number of trial segments
+  - engine: window        # 'window' (sliding trial segments) or 'optimal' (exact fit)
+  - rift-penalty: 4.0     # optimal engine: rift cost in units of noise-variance*ln(#pts)
 - ad-params: !!omap  # advertising removal params
   - limit_s: 120 # restricts some regexes to 'limit_s' of start/end
   - limited-regexes: # these are matched only if within 'limit_s' of start/end
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Persistent cache of the listings of library folders (i.e., the names of
+the videos and the subfolders of each folder) keyed by folder and checked
+against the folder's mtime; so, a library scan does one stat per folder
+and re-lists (with os.scandir() whose d_type avoids a stat per entry)
+only the folders that changed since the last scan.
+
+NOTE: a folder listed within MTIME_SLOP seconds of its last change is not
+cached since another change within the mtime granularity would go unseen.
+"""
+# pylint: disable=broad-except
+import os
+import time
+import json
+import atexit
+import sqlite3
+from types import SimpleNamespace
+from LibGen.CustLogger import CustLogger as lg
+import LibSub.SubShopDirs as ssd
+
+
+class DirListings:
+    """The folder listing cache; normally, use DirListings.get() so that one is
+    shared per process (since connections must not cross a fork)."""
+    instance = None
+    MTIME_SLOP = 2.0  # secs
+    COMMIT_EVERY = 200  # uncommitted listings
+    schema = '''
+        CREATE TABLE IF NOT EXISTS listings (
+            path TEXT PRIMARY KEY,
+            mtime REAL,     -- mtime of the folder when listed
+            videos TEXT,    -- JSON list of the basenames of its video files
+            subdirs TEXT    -- JSON list of the basenames of its subfolders (but .cache)
+        );
+    '''
+
+    def __init__(self, dbpath=None):
+        self.dbpath = dbpath if dbpath else ssd.get_listings_db()
+        self.pid = os.getpid()
+        self.conn = None
+        self.dirty_cnt = 0
+        self.stats = SimpleNamespace(dirs=0, listed=0)
+        try:
+            os.makedirs(os.path.dirname(self.dbpath), exist_ok=True)
+            self.conn = sqlite3.connect(self.dbpath, timeout=60)
+            self.conn.executescript(self.schema)
+            atexit.register(self.commit)
+        except Exception as exc:
+            lg.warn(f'cannot open {self.dbpath!r} (folders will not be cached): {exc}')
+            self.conn = None
+
+    @staticmethod
+    def get():
+        """Return the listing cache of this process."""
+        listings = DirListings.instance
+        if not listings or listings.pid != os.getpid():
+            listings = DirListings.instance = DirListings()
+        return listings
+
+    def list_dir(self, folder):
+        """Return the listing of a folder as a namespace with:
+            - videos - the basenames of its video files
+            - subdirs - the basenames of its subfolders (other than .cache folders)
+        either as cached (if the folder is unchanged) or freshly listed."""
+        # pylint: disable=import-outside-toplevel
+        from LibSub.VideoParser import VideoParser
+        folder = os.path.abspath(folder)
+        self.stats.dirs += 1
+        mtime = os.stat(folder).st_mtime
+        row = self._select(folder)
+        if row and row[0] == mtime:
+            return SimpleNamespace(videos=json.loads(row[1]), subdirs=json.loads(row[2]))
+
+        self.stats.listed += 1
+        videos, subdirs = [], []
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    if VideoParser.has_video_ext(entry.name):
+                        videos.append(entry.name)
+                elif entry.is_dir() and not entry.name.endswith('.cache'):
+                    subdirs.append(entry.name)
+        if time.time() - mtime > self.MTIME_SLOP:
+            self._replace(folder, mtime, videos, subdirs)
+        elif row:
+            self._delete(folder)
+        return SimpleNamespace(videos=videos, subdirs=subdirs)
+
+    def commit(self):
+        """Commit the pending listings (also done at exit)."""
+        if self.conn and self.dirty_cnt and self.pid == os.getpid():
+            try:
+                self.conn.commit()
+            except Exception as exc:
+                lg.warn(f'cannot commit {self.dbpath!r}: {exc}')
+            self.dirty_cnt = 0
+
+    def _select(self, folder):
+        if not self.conn:
+            return None
+        try:
+            return self.conn.execute('SELECT mtime, videos, subdirs FROM listings'
+                    ' WHERE path=?', (folder,)).fetchone()
+        except Exception as exc:
+            lg.warn(f'cannot read {self.dbpath!r} (folders will not be cached): {exc}')
+            self.conn = None
+            return None
+
+    def _write(self, sql, args):
+        if not self.conn:
+            return
+        try:
+            self.conn.execute(sql, args)
+        except Exception as exc:
+            lg.warn(f'cannot write {self.dbpath!r} (folders will not be cached): {exc}')
+            self.conn = None
+            return
+        self.dirty_cnt += 1
+        if self.dirty_cnt >= self.COMMIT_EVERY:
+            self.commit()
+
+    def _replace(self, folder, mtime, videos, subdirs):
+        self._write('INSERT OR REPLACE INTO listings (path, mtime, videos, subdirs)'
+                ' VALUES (?, ?, ?, ?)', (folder, mtime, json.dumps(videos), json.dumps(subdirs)))
+
+    def _delete(self, folder):
+        self._write('DELETE FROM listings WHERE path=?', (folder,))
+
+
+def runner(argv):
+    """
+    DirListings.py [H,S]: the persistent cache of library folder listings.
+    Its runner() lists the videos below the given folders (as a library scan
+    would) and shows how many folders had to be re-listed.
+    """
+    import argparse # pylint: disable=import-outside-toplevel
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-V', '--log-level', choices=lg.choices,
+        default='INFO', help='set logging/verbosity level [dflt=INFO]')
+    parser.add_argument('folders', nargs='+', help='folders to list')
+    opts = parser.parse_args(argv)
+    lg.setup(level=opts.log_level)
+    listings = DirListings.get()
+    folders, video_cnt = [os.path.abspath(folder) for folder in opts.folders], 0
+    while folders:
+        folder = folders.pop(0)
+        listing = listings.list_dir(folder)
+        video_cnt += len(listing.videos)
+        if not listing.videos:
+            folders += [os.path.join(folder, subdir) for subdir in listing.subdirs]
+    lg.pr(f'videos={video_cnt} dirs={listings.stats.dirs} listed={listings.stats.listed}')
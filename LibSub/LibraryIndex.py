@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Persistent SQLite index of the library (i.e., the videos below the
+tv-root-dirs and movie-root-dirs) and of the subtitle state of each video
+(i.e., its srts, quirk, score, reference, and probe info) so that the
+library-wide commands (e.g., "todo", "stat", "tvreport") need not walk
+the library and glob every video and .cache folder.
+  - "subshop index" builds/refreshes the index;
+  - a refresh re-lists only the folders whose mtime changed and re-reads
+    the state of only the videos whose folder or .cache folder changed;
+  - subshop updates the rows of the videos that it handles (since, say,
+    touching a quirk file does not change the mtime of its folder).
+"""
+# pylint: disable=broad-except
+import os
+import time
+import json
+import sqlite3
+from types import SimpleNamespace
+from LibGen.CustLogger import CustLogger as lg
+from LibSub import ConfigSubshop
+import LibSub.SubShopDirs as ssd
+from LibSub.SubCache import SubCache
+from LibSub.DirListings import DirListings
+
+
+class LibraryIndex:
+    """The library index; normally, use LibraryIndex.get() so that one is
+    shared per process (since connections must not cross a fork)."""
+    params = ConfigSubshop.get_params()
+    instance = None
+    MTIME_SLOP = 2.0  # secs; a folder changed more recently is re-read next refresh
+    video_cols = ('path', 'dir', 'mtime', 'cache_mtime', 'srt_cnt', 'srt_score',
+            'quirk', 'q_value', 'quirk_mtime', 'has_reference', 'subt_stream',
+            'audio_stream', 'duration', 'show_dpath', 'season', 'is_special')
+    schema = '''
+        CREATE TABLE IF NOT EXISTS dirs (
+            path TEXT PRIMARY KEY,  -- folder at/below a root folder
+            mtime REAL,             -- mtime when last listed (-1 if too fresh to trust)
+            subdirs TEXT            -- JSON list of the subfolders searched
+        );
+        CREATE TABLE IF NOT EXISTS videos (
+            path TEXT PRIMARY KEY, dir TEXT, mtime REAL,
+            cache_mtime REAL,       -- mtime of .cache folder when last read (0 if none,
+                                    -- -1 if too fresh to trust)
+            srt_cnt INTEGER, srt_score INTEGER,
+            quirk TEXT, q_value INTEGER, quirk_mtime REAL,
+            has_reference INTEGER, subt_stream TEXT, audio_stream TEXT,
+            duration REAL, show_dpath TEXT, season INTEGER, is_special INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS videos_dir ON videos (dir);
+    '''
+
+    def __init__(self, dbpath=None):
+        self.dbpath = dbpath if dbpath else ssd.get_index_db()
+        os.makedirs(os.path.dirname(self.dbpath), exist_ok=True)
+        self.pid = os.getpid()
+        self.conn = sqlite3.connect(self.dbpath, timeout=60)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(self.schema)
+        self.stats = SimpleNamespace(dirs=0, listed=0, videos=0, reread=0, removed=0)
+
+    @staticmethod
+    def get(create=False):
+        """Return the index of this process; None if there is no index yet
+        (unless create)."""
+        index = LibraryIndex.instance
+        if index and index.pid == os.getpid():
+            return index
+        if not create and not os.path.isfile(ssd.get_index_db()):
+            return None
+        LibraryIndex.instance = LibraryIndex()
+        return LibraryIndex.instance
+
+    def refresh(self, roots=None):
+        """Bring the index up to date with the library (or the given folders
+        only).  Returns: the stats of the refresh."""
+        if not roots:
+            roots = self.params.tv_root_dirs + self.params.movie_root_dirs
+        with self.conn:
+            for root in roots:
+                root = os.path.abspath(root)
+                if os.path.isdir(root):
+                    self._refresh_dir(root)
+                else:
+                    self._forget_dir(root)
+        return self.stats
+
+    def _refresh_dir(self, folder):
+        """Refresh one folder and, recursively, the folders below it.  As with
+        VideoFinder, a folder with videos is not searched deeper."""
+        self.stats.dirs += 1
+        try:
+            mtime = os.stat(folder).st_mtime
+        except OSError:
+            self._forget_dir(folder)
+            return
+        row = self.conn.execute('SELECT mtime, subdirs FROM dirs WHERE path=?',
+                (folder,)).fetchone()
+        if row and row['mtime'] == mtime: # same listing; check just the .cache folders
+            subdirs = json.loads(row['subdirs'])
+            for video in self.conn.execute('SELECT path, cache_mtime FROM videos WHERE dir=?',
+                    (folder,)).fetchall():
+                self.stats.videos += 1
+                if self._get_cache_mtime(video['path']) != video['cache_mtime']:
+                    self.update_video(video['path'])
+        else:
+            self.stats.listed += 1
+            listing = DirListings.get().list_dir(folder)
+            videos = [os.path.join(folder, basename) for basename in listing.videos]
+            subdirs = [os.path.join(folder, basename) for basename in listing.subdirs]
+            if videos:
+                subdirs = []
+            olds = {video['path'] for video in self.conn.execute(
+                    'SELECT path FROM videos WHERE dir=?', (folder,))}
+            for path in olds - set(videos):
+                self.stats.removed += 1
+                self.conn.execute('DELETE FROM videos WHERE path=?', (path,))
+            for path in videos: # any may have new/renamed srts
+                self.stats.videos += 1
+                self.update_video(path)
+            for path in set(json.loads(row['subdirs']) if row else []) - set(subdirs):
+                self._forget_dir(path)
+            self.conn.execute('INSERT OR REPLACE INTO dirs (path, mtime, subdirs)'
+                    ' VALUES (?, ?, ?)', (folder, self._trusted_mtime(mtime),
+                    json.dumps(sorted(subdirs))))
+        for path in sorted(subdirs):
+            self._refresh_dir(path)
+
+    def _forget_dir(self, folder):
+        """Remove a folder and everything below it from the index."""
+        prefix = folder.rstrip(os.sep) + os.sep
+        for table, col in (('dirs', 'path'), ('videos', 'dir')):
+            self.conn.execute(f'DELETE FROM {table} WHERE {col}=? OR substr({col}, 1, ?)=?',
+                    (folder, len(prefix), prefix))
+
+    @staticmethod
+    def _trusted_mtime(mtime):
+        """Return the mtime to record for a folder; but -1 (which never
+        matches) if it changed so recently that another change within the
+        mtime granularity would go unseen."""
+        return mtime if time.time() - mtime > LibraryIndex.MTIME_SLOP else -1.0
+
+    @staticmethod
+    def _get_cache_mtime(videopath):
+        try:
+            return os.stat(os.path.splitext(videopath)[0] + '.cache').st_mtime
+        except OSError:
+            return 0.0
+
+    def update_video(self, videopath):
+        """(Re)read the state of a video into the index (or remove it if gone)."""
+        videopath = os.path.abspath(videopath)
+        if not os.path.isfile(videopath):
+            self.conn.execute('DELETE FROM videos WHERE path=?', (videopath,))
+            return
+        self.stats.reread += 1
+        try:
+            subcache = SubCache(videopath)
+            probeinfo = subcache.get_probeinfo()
+            srts = subcache.get_subtpaths()
+            quirk = subcache.get_quirk()
+            quirk_mtime = os.path.getmtime(subcache.quirk_makepath(quirk, subcache.q_value)
+                    ) if quirk else 0.0
+            parsed = subcache.parsed
+            values = (videopath, os.path.dirname(videopath), os.path.getmtime(videopath),
+                    self._trusted_mtime(self._get_cache_mtime(videopath)), len(srts), subcache.get_srt_score(),
+                    quirk, subcache.q_value if quirk else None, quirk_mtime,
+                    int(bool(subcache.get_cached_subtpaths().references)),
+                    probeinfo.get_subt_stream() if probeinfo else None,
+                    probeinfo.get_audio_stream() if probeinfo else None,
+                    probeinfo.duration if probeinfo else None,
+                    subcache.omdb_dpath, parsed.season if parsed else None,
+                    int(bool(parsed and parsed.is_special)))
+        except Exception as exc:
+            lg.warn(f'cannot index {videopath!r}: {exc}')
+            return
+        self.conn.execute(f'INSERT OR REPLACE INTO videos ({", ".join(self.video_cols)})'
+                f' VALUES ({", ".join("?" * len(self.video_cols))})', values)
+
+    def note_video(self, videopath):
+        """Update the row of a video that subshop handled (and commit)."""
+        with self.conn:
+            self.update_video(videopath)
+
+    def get_videos(self, folders=None):
+        """Return the state of the indexed videos (below the given folders if
+        any) ordered by path; each is a namespace of the columns plus:
+          - expired - whether its AUTODEFER/SCORE quirk is expired
+            (and an expired AUTODEFER is dropped as SubCache.get_quirk() does)."""
+        rows = self.conn.execute('SELECT * FROM videos ORDER BY path').fetchall()
+        prefixes = tuple(os.path.abspath(folder).rstrip(os.sep) + os.sep
+                for folder in folders) if folders else None
+        states = []
+        for row in rows:
+            if prefixes and not row['path'].startswith(prefixes):
+                continue
+            state = SimpleNamespace(**dict(row))
+            state.expired = False
+            if state.quirk in (SubCache.AUTODEFER, SubCache.SCORE):
+                state.expired, _ = SubCache.get_quirk_expiry(state.mtime, state.quirk_mtime)
+                if state.expired and state.quirk == SubCache.AUTODEFER:
+                    state.quirk, state.q_value = '', None
+            states.append(state)
+        return states
+
+
+def runner(argv):
+    """
+    LibraryIndex.py [H,S]: the SQLite library index of videos and their subtitle state.
+    Its runner() refreshes the index (of the library or the given folders) and shows
+    the refresh stats.
+    """
+    import argparse # pylint: disable=import-outside-toplevel
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-V', '--log-level', choices=lg.choices,
+        default='INFO', help='set logging/verbosity level [dflt=INFO]')
+    parser.add_argument('folders', nargs='*', help='folders to refresh [dflt=library]')
+    opts = parser.parse_args(argv)
+    lg.setup(level=opts.log_level)
+    stats = LibraryIndex.get(create=True).refresh(opts.folders)
+    lg.pr(f'dirs={stats.dirs} listed={stats.listed} videos={stats.videos}'
+            f' reread={stats.reread} removed={stats.removed}')
@@ -12,6 +12,12 @@
           /{vid-corenm}.cache        # directory for one videofile' paraphernalia
           /{vid-corenm}.cache/{vid-corenm}.en[.forced].TORRENT.{subx}
           /{vid-corenm}.cache/{vid-corenm}.REFERENCE.{subx}
+          /{vid-corenm}.cache/{vid-corenm}.REFERENCE.words # word timings of reference
+          /{vid-corenm}.cache/{vid-corenm}.REFERENCE.partial # windows not transcribed
+          /{vid-corenm}.cache/{vid-corenm}.REFERENCE.ckpt # progress of interrupted reference
+          /{vid-corenm}.cache/{vid-corenm}.REFERENCE.anal # preprocessed reference
+          /{vid-corenm}.cache/{vid-corenm}.AUDIO.{stream}.{size}.{mtime}.flac # opt. decoded audio
+          /{vid-corenm}.cache/{vid-corenm}.FPRINT # audio fingerprint (to match other releases)
           /{vid-corenm}.cache/{vid-corenm}.AUTOSUB.{subx}
           /{vid-corenm}.cache/{vid-corenm}.EMBEDDED.{subx}
           /{vid-corenm}.cache/{downloaded-subt}...
@@ -35,15 +41,20 @@ import re
 import time
 import glob
 import math
+import shutil
+import subprocess
 from pathlib import Path
 from types import SimpleNamespace
 from send2trash import send2trash
 from LibGen.YamlDump import yaml_str
 from LibGen.CustLogger import CustLogger as lg
 from LibSub import ConfigSubshop
+import LibSub.SubShopDirs as ssd
 from LibSub.VideoProbe import VideoProbe
 from LibSub.TmdbTool import TmdbTool
 from LibSub.VideoParser import VideoParser, VideoFinder
+from LibSub.SubFixer import CaptionList, Caption
+from LibSub.AudioAligner import AudioAligner
 
 class SubCache():
     """For handling the subtitle cache."""
@@ -52,6 +63,9 @@ class SubCache():
     subshop_params = ConfigSubshop.get_params()
     opts = None
     omdbtool = None
+    folder_cats = {} # process-wide paths by category per folder (see get_folder_cats())
+    FOLDER_CATS_MAX = 100 # most folders kept in folder_cats
+    MTIME_SLOP = 2.0 # secs; folders changed more recently are not kept
 
     # symbolic constants for quirk tags TODO get rid of deprecated
     FOREIGN = 'FOREIGN' # does not have english audio
@@ -226,30 +240,79 @@ class SubCache():
         if folder == self.cache_dpath and not refresh and self.cache_cats:
             return self.cache_cats
 
-        rv = SimpleNamespace(videopaths=[], subtpaths=[], quirkpaths=[], otherpaths=[])
-        paths = glob.glob(os.path.join(glob.escape(folder), '*'))
-        # lg.info('get_paths_by_category() folder:', folder, type(paths),
-                # len(paths), '\n', yaml_str(paths))
-        for idx in range(len(paths)-1, -1, -1):
-            path = paths[idx]
-            # lg.info('get_paths_by_category() path:', idx, paths[idx])
-            if VideoParser.has_video_ext(path):
-                rv.videopaths.append(path)
-            elif VideoParser.has_subt_ext(path):
-                rv.subtpaths.append(path)
-            elif os.path.basename(path).startswith('quirk.'):
-                rv.quirkpaths.append(path)
-            else:
-                rv.otherpaths.append(path)
-        # lg.info(tb.backtrace())
-        # lg.info('get_paths_by_category() returning:\n', yaml_str(rv))
-        # lg.info(type(rv), rv)
+        rv = self.get_folder_cats(folder, refresh=refresh)
         if folder == self.video_dpath:
             self.video_cats = rv
         elif folder == self.cache_dpath:
             self.cache_cats = rv
         return rv
 
+    @staticmethod
+    def get_folder_cats(folder, refresh=False):
+        """Get the paths in a folder by category from the process-wide cache
+        (so the videos of a folder share one listing); the folder is re-listed
+        if refresh, if its mtime changed, or if forgotten (see forget_folder()).
+        Returns: a copy (which the caller may alter)."""
+        try:
+            mtime = os.stat(folder).st_mtime
+        except (OSError, TypeError):
+            mtime = None
+        entry = SubCache.folder_cats.pop(folder, None)
+        if refresh or not entry or mtime is None or entry[0] != mtime:
+            cats = SimpleNamespace(videopaths=[], subtpaths=[], quirkpaths=[], otherpaths=[])
+            paths = glob.glob(os.path.join(glob.escape(folder), '*')) if mtime else []
+            for idx in range(len(paths)-1, -1, -1):
+                path = paths[idx]
+                if VideoParser.has_video_ext(path):
+                    cats.videopaths.append(path)
+                elif VideoParser.has_subt_ext(path):
+                    cats.subtpaths.append(path)
+                elif os.path.basename(path).startswith('quirk.'):
+                    cats.quirkpaths.append(path)
+                else:
+                    cats.otherpaths.append(path)
+            entry = (mtime, cats)
+            if not mtime or time.time() - mtime <= SubCache.MTIME_SLOP:
+                return cats # too fresh to keep (a change within the mtime granularity is unseen)
+        SubCache.folder_cats[folder] = entry # (re)insert as most recently used
+        while len(SubCache.folder_cats) > SubCache.FOLDER_CATS_MAX:
+            del SubCache.folder_cats[next(iter(SubCache.folder_cats))]
+        return SimpleNamespace(**{key: list(paths) for key, paths in vars(entry[1]).items()})
+
+    @staticmethod
+    def forget_folder(folder):
+        """Forget the cached listing of a folder in which files were created,
+        renamed, or removed (which the mtime check may miss; e.g., on network
+        file systems)."""
+        if folder:
+            SubCache.folder_cats.pop(folder, None)
+
+    @staticmethod
+    def forget_video_folders(videopath):
+        """Forget the cached listings of a video's folder and cache folder."""
+        videopath = os.path.abspath(videopath)
+        SubCache.forget_folder(os.path.dirname(videopath))
+        SubCache.forget_folder(os.path.splitext(videopath)[0] + '.cache')
+
+    @staticmethod
+    def stamp_video_folders(videopath):
+        """Return a stamp of a video's files and cache folder (names, sizes,
+        and mtimes) that differs whenever any of them were changed."""
+        videopath = os.path.abspath(videopath)
+        corename = os.path.splitext(os.path.basename(videopath))[0]
+        stamp = []
+        for folder, prefix in ((os.path.dirname(videopath), corename),
+                (os.path.splitext(videopath)[0] + '.cache', '')):
+            try:
+                with os.scandir(folder) as entries:
+                    for entry in entries:
+                        if entry.name.startswith(prefix):
+                            stat = entry.stat(follow_symlinks=False)
+                            stamp.append((folder, entry.name, stat.st_size, stat.st_mtime_ns))
+            except OSError:
+                pass
+        return sorted(stamp)
+
     def get_subtpaths(self):
         """Get all the (uncached) subtitles belonging to the current video
         and native language ordered by "most preferred":
@@ -305,6 +368,7 @@ class SubCache():
                             os.replace(path, lang_srt_path)
                         else:
                             os.unlink(path)
+                self.forget_folder(self.video_dpath)
                 self.soft_set_quirk(SubCache.SCORE, least_score, keep_modtime=True)
             else:
                 break
@@ -395,27 +459,34 @@ class SubCache():
         if not self.quirk:
             return ''
         if self.quirk in ('AUTODEFER', 'SCORE', ):
-            def days_ago(secs):
-                rv = round((time.time()- secs)/(24*3600), 3) if secs > 0 else 0
-                # <-10: assume ago far in the future means very old
-                # <0: avoid a sqrt exception and assume actually very new
-                return 365*2 if rv < -10 else 0 if rv < 0 else rv
-
-            video_age_d = days_ago(os.path.getmtime(self.get_videopath()))
-            max_days = SubCache.subshop_params.cmd_opts_defaults.auto_retry_max_days
-            expiry_d = round(min(max_days, math.sqrt(video_age_d)), 3)
-            quirk_age_d = days_ago(os.path.getmtime(self.quirk_makepath(
-                self.quirk, self.q_value)))
-            # lg.info('quirk_age_d:', quirk_age_d, 'expiry_d:', expiry_d)
-            self.expired = bool(quirk_age_d > expiry_d)
-            self.defer_why = ('' if self.expired else
-                    f'age({round(quirk_age_d)}d) <= expiry({round(expiry_d)}d)')
+            self.expired, self.defer_why = self.get_quirk_expiry(
+                    os.path.getmtime(self.get_videopath()),
+                    os.path.getmtime(self.quirk_makepath(self.quirk, self.q_value)))
             if self.expired and self.quirk in ('AUTODEFER', ):
                 self.clear_quirks()
                 self.quirk, self.q_value = '', None
 
         return self.quirk
 
+    @staticmethod
+    def get_quirk_expiry(video_mtime, quirk_mtime):
+        """Given the mtimes of the video and its AUTODEFER/SCORE quirk file,
+        return (whether expired, why deferred if not)."""
+        def days_ago(secs):
+            rv = round((time.time()- secs)/(24*3600), 3) if secs > 0 else 0
+            # <-10: assume ago far in the future means very old
+            # <0: avoid a sqrt exception and assume actually very new
+            return 365*2 if rv < -10 else 0 if rv < 0 else rv
+
+        video_age_d = days_ago(video_mtime)
+        max_days = SubCache.subshop_params.cmd_opts_defaults.auto_retry_max_days
+        expiry_d = round(min(max_days, math.sqrt(video_age_d)), 3)
+        quirk_age_d = days_ago(quirk_mtime)
+        # lg.info('quirk_age_d:', quirk_age_d, 'expiry_d:', expiry_d)
+        expired = bool(quirk_age_d > expiry_d)
+        return expired, ('' if expired else
+                f'age({round(quirk_age_d)}d) <= expiry({round(expiry_d)}d)')
+
     def clear_quirks(self):
         """Remove the current exception if any.
         Returns the modtime of any AUTODEFER or None.
@@ -427,6 +498,7 @@ class SubCache():
                 if not modtime and SubCache.AUTODEFER in quirk:
                     modtime = os.path.getmtime(quirk)
                 os.unlink(quirk) # there is only supposed to be one
+                self.forget_folder(self.cache_dpath)
         cat.quirkpaths = []
         self.quirk = ''
         return modtime
@@ -451,6 +523,7 @@ class SubCache():
         # lg.info('autodefer_modtime:', modtime)
         quirkpath = self.quirk_makepath(quirk, value)
         Path(quirkpath).touch()
+        self.forget_folder(self.cache_dpath)
         self.cache_cats.quirkpaths.insert(0, quirkpath)
         if keep_modtime:
             if modtime is None:
@@ -500,11 +573,236 @@ class SubCache():
         if ensure_dir and not os.path.isdir(cache_d):
             lg.db(f'making {cache_d}')
             os.makedirs(cache_d)
+            self.forget_folder(self.video_dpath)
         else:
             lg.db(f'making {cache_d} not needed / not opted')
         lg.db(f'makepath returns: {newpath}')
         return newpath
 
+    @staticmethod
+    def get_artifactpath(ref_path):
+        """Return the path of the analysis artifact of a reference SRT
+        (which lives beside it in the cache folder)."""
+        preext, _ = os.path.splitext(ref_path)
+        return preext + '.anal'
+
+    @staticmethod
+    def get_wordspath(ref_path):
+        """Return the path of the word timings of a reference SRT
+        (as written by "video2srt --words")."""
+        preext, _ = os.path.splitext(ref_path)
+        return preext + '.words'
+
+    @staticmethod
+    def get_checkpointpath(ref_path):
+        """Return the path of the progress of making a reference SRT (as
+        written by "video2srt --checkpoint"); it persists until the SRT is made."""
+        preext, _ = os.path.splitext(ref_path)
+        return preext + '.ckpt'
+
+    @staticmethod
+    def is_partial_reference(ref_path):
+        """Return True if the reference SRT was made by a progressive
+        "video2srt" that stopped early (i.e., it has a .partial file)."""
+        preext, _ = os.path.splitext(ref_path)
+        return os.path.isfile(preext + '.partial')
+
+    def get_reference_caplist(self, ref_path):
+        """Get the CaptionList of the reference SRT, from its analysis
+        artifact if current.  Returns (caplist, is_from_artifact)."""
+        caplist = CaptionList.load_artifact(self.get_artifactpath(ref_path), ref_path)
+        if caplist:
+            lg.tr1('reference from artifact:', self.get_artifactpath(ref_path))
+            return caplist, True
+        with open(ref_path, 'r', encoding='utf-8', errors='ignore') as srt:
+            caplist = CaptionList(srt)
+        words_path = self.get_wordspath(ref_path)
+        if (os.path.isfile(words_path) # but ignore if older than the SRT
+                and os.path.getmtime(words_path) >= os.path.getmtime(ref_path)):
+            caplist.load_timed_words(words_path)
+        return caplist, False
+
+    def put_reference_caplist(self, ref_path, caplist):
+        """Save the analysis artifact of a (normalized) reference CaptionList."""
+        try:
+            caplist.save_artifact(self.get_artifactpath(ref_path), ref_path)
+        except Exception as exc:
+            lg.warn('cannot save reference artifact:', exc)
+
+    def get_audiopath(self, stream):
+        """Return the path of the cached audio of a stream of the video; the
+        video size/mtime are in the name so that stale audio never matches."""
+        stat = os.stat(self.get_videopath())
+        return os.path.join(self.cache_dpath, f'{self.video_corename}.AUDIO'
+                f'.{stream.replace(":", "-")}.{stat.st_size}.{int(stat.st_mtime)}.flac')
+
+    def get_audio_source(self, stream):
+        """Return (path, stream) from which to decode the given audio stream:
+          - if audio-cache-params.enabled, the cached audio (which is
+            extracted on first use and evicts others per max-mb),
+          - else (or on failure) the video and the stream itself.
+        """
+        videopath = self.get_videopath()
+        if not self.subshop_params.audio_cache_params.enabled:
+            return videopath, stream
+        audiopath = self.get_audiopath(stream)
+        if os.path.isfile(audiopath):
+            os.utime(audiopath) # mark as recently used
+            return audiopath, '0:0'
+
+        for stale in self.glob(self.video_corename, '.AUDIO.*.flac', cache_only=True):
+            lg.db('removing stale audio:', stale)
+            os.unlink(stale)
+        self.makepath(audiopath) # ensure the cache folder
+        tmppath = audiopath + '.tmp'
+        cmd = ['ffmpeg', '-nostdin', '-nostats', '-hide_banner', '-loglevel', 'error',
+                '-y', '-i', videopath, '-map', stream, '-ar', '16000', '-ac', '1',
+                '-c:a', 'flac', '-f', 'flac', tmppath]
+        lg.pr('\n+', 'caching audio of', self.video_basename)
+        rv = subprocess.run(cmd, check=False).returncode
+        if rv or not os.path.isfile(tmppath):
+            lg.err(f'cannot cache audio [ffmpeg returned {rv}]')
+            if os.path.isfile(tmppath):
+                os.unlink(tmppath)
+            return videopath, stream
+        os.replace(tmppath, audiopath)
+        self.forget_folder(self.cache_dpath)
+        self.evict_audio(audiopath)
+        return audiopath, '0:0'
+
+    @staticmethod
+    def evict_audio(new_audiopath=None):
+        """Register a newly cached audio file (if any) and remove the least
+        recently used cached audio until the total is within max-mb."""
+        max_bytes = SubCache.subshop_params.audio_cache_params.max_mb * 1024 * 1024
+        registry = os.path.join(ssd.cache_d, 'audio-cache.list')
+        paths = []
+        if os.path.isfile(registry):
+            with open(registry, 'r', encoding='utf-8') as fh:
+                paths = [line.rstrip('\n') for line in fh if line.strip()]
+        if new_audiopath and new_audiopath not in paths:
+            paths.append(new_audiopath)
+
+        stats = []
+        for path in paths:
+            try:
+                stats.append((os.stat(path), path))
+            except OSError:
+                pass  # removed by other means (e.g., video removed)
+        stats.sort(key=lambda x: x[0].st_mtime, reverse=True)
+        keeps, total = [], 0
+        for stat, path in stats:
+            if total + stat.st_size > max_bytes and path != new_audiopath:
+                lg.db('evicting audio:', path)
+                try:
+                    os.unlink(path)
+                except OSError as exc:
+                    lg.warn(f'cannot evict {path!r}: {exc}')
+                continue
+            total += stat.st_size
+            keeps.append(path)
+
+        os.makedirs(ssd.cache_d, exist_ok=True)
+        with open(registry + '.tmp', 'w', encoding='utf-8') as fh:
+            fh.write(''.join(path + '\n' for path in keeps))
+        os.replace(registry + '.tmp', registry)
+
+    def get_fprintpath(self):
+        """Return the path of the audio fingerprint of the video."""
+        return os.path.join(self.cache_dpath, f'{self.video_corename}.FPRINT')
+
+    def get_fingerprint(self, stream=None, persist=True):
+        """Get the audio fingerprint of the video from its file if current, else
+        compute it (and save it unless persist is False).
+        Returns: the fingerprint or None if no audio."""
+        fprintpath = self.get_fprintpath()
+        if (os.path.isfile(fprintpath) and os.path.getmtime(fprintpath)
+                >= os.path.getmtime(self.get_videopath())):
+            fprint = AudioAligner.load_fingerprint(fprintpath)
+            if fprint:
+                return fprint
+        stream = stream if stream else self.get_probeinfo().get_audio_stream()
+        if not stream:
+            return None
+        fprint = AudioAligner(*self.get_audio_source(stream)).get_fingerprint()
+        if fprint and persist:
+            self.makepath(fprintpath) # ensure the cache folder
+            AudioAligner.save_fingerprint(fprintpath, fprint)
+        return fprint
+
+    def find_replaced(self):
+        """Find other releases of the same episode (or movie) in the video folder
+        with a cache folder (i.e., replaced videos whose cache is left behind or
+        videos about to be replaced).  Returns: [SubCache, ...]"""
+        rv = []
+        if not self.parsed or self.parsed.is_error():
+            return rv
+        for cache_dpath in glob.glob(os.path.join(glob.escape(self.video_dpath), '*.cache')):
+            corename = os.path.basename(cache_dpath)[:-len('.cache')]
+            if corename == self.video_corename or not os.path.isdir(cache_dpath):
+                continue
+            videopaths = [path for path in self._get_paths_by_category(self.video_dpath).videopaths
+                    if os.path.splitext(os.path.basename(path))[0] == corename]
+            # NOTE: a made-up suffix for a gone video so the corename is kept intact
+            other = SubCache(videopaths[0] if videopaths else
+                    os.path.join(self.video_dpath, corename + '.mkv'), force_is_file=True)
+            if not other.parsed or other.parsed.is_error():
+                continue
+            if self.is_tvdir and self.parsed.is_tv_episode() and (
+                    self.parsed.season, self.parsed.episode) == (
+                    other.parsed.season, other.parsed.episode):
+                rv.append(other)
+            elif not self.is_tvdir and self.parsed.is_same_movie_year(other.parsed):
+                # pylint: disable=protected-access
+                if (VideoFinder._normalize(self.parsed.title)
+                        == VideoFinder._normalize(other.parsed.title)):
+                    rv.append(other)
+        return rv
+
+    def migrate_from_replaced(self):
+        """If another release of the video (see find_replaced()) has a reference
+        and its audio fingerprint matches this video's, map its reference onto
+        this video and copy its downloaded subs.  NOTE: fingerprints are made
+        only here (i.e., once a replaced release is found); so, the other
+        release must still be on disk unless its fingerprint was saved.
+        Returns: the SubCache of the other release if migrated, else None."""
+        min_score = self.subshop_params.release_swap_params.min_score
+        fprint = None
+        for other in self.find_replaced():
+            refs = [ref for ref in other.get_cached_subtpaths(refresh=True).references
+                    if not self.is_partial_reference(ref)]
+            if not refs:
+                continue
+            if os.path.isfile(other.get_videopath()):
+                ofprint = other.get_fingerprint()
+            else:
+                ofprint = AudioAligner.load_fingerprint(other.get_fprintpath())
+            fprint = fprint if fprint else self.get_fingerprint()
+            if not ofprint or not fprint:
+                continue
+            result = AudioAligner.match_fingerprints(ofprint, fprint)
+            descr = (f'offset {result.offset_ms/1000:.1f}s rate {result.rate}'
+                    f' score {result.score}')
+            if result.score < min_score:
+                lg.pr(f'NOTE: {other.video_corename} is not the same audio [{descr}]')
+                continue
+
+            lg.pr(f'\n===> Reusing reference of {other.video_corename} [{descr}]')
+            with open(refs[0], 'r', encoding='utf-8', errors='ignore') as srt:
+                caplist = CaptionList(srt)
+            caplist.adjust_subs(result)
+            tag = os.path.splitext(os.path.splitext(refs[0])[0])[1] # e.g., .REFERENCE
+            Caption.write_to_file(self.makepath(self.video_corename + tag + '.srt'),
+                    caplist.captions)
+            for path in other.get_cached_subtpaths().downloads + glob.glob(
+                    os.path.join(glob.escape(other.cache_dpath), 'omdb-info.yaml')):
+                newpath = self.makepath(path)
+                if not os.path.exists(newpath):
+                    shutil.copy2(path, newpath)
+            self._get_paths_by_category(self.cache_dpath, refresh=True)
+            return other
+        return None
+
     def _pr_divider(self):
         if self.divider:
             lg.pr(self.divider)
@@ -523,6 +821,7 @@ class SubCache():
 
         try:
             send2trash(path)
+            self.forget_folder(os.path.dirname(path))
         except Exception as exc:
             lg.err(f'cannot trash "{basename}"\n  {exc}')
 
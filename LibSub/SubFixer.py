@@ -8,6 +8,7 @@ Cleanse/shift SRT files.
 # pylint: disable=too-many-boolean-expressions,too-many-branches
 # pylint: disable=consider-using-f-string
 import argparse
+import io
 import os
 import re
 import shutil
@@ -15,6 +16,9 @@ import sys
 import statistics
 import math
 import copy
+import pickle
+import zlib
+from array import array
 from types import SimpleNamespace
 
 # from io import FileIO as file
@@ -159,6 +163,91 @@ class Caption:
         rv = sec_str(self.beg_ms) + ' ' + ' '.join((' '.join(self.lines)).split()[0:max_wds])
         return rv
 
+class CaptionColumns:
+    """Compact, columnar form of a list of captions:
+     - beg_ms/end_ms are typed arrays (one entry per caption)
+     - texts is a table of the caption lines shared by all copies
+     - leaders are the caption leaders (also shared)
+    Time transforms are done over the arrays as a whole, and a copy
+    is just a copy of the two arrays.
+    """
+    TYPECODE = 'q'
+
+    def __init__(self, beg_ms=None, end_ms=None, texts=None, leaders=None):
+        self.beg_ms = array(self.TYPECODE, beg_ms if beg_ms else [])
+        self.end_ms = array(self.TYPECODE, end_ms if end_ms else [])
+        self.texts = texts if texts is not None else []
+        self.leaders = leaders if leaders is not None else []
+
+    @staticmethod
+    def from_captions(captions):
+        """Create the columns from a list of Caption objects."""
+        return CaptionColumns(beg_ms=[cap.beg_ms for cap in captions],
+                end_ms=[cap.end_ms for cap in captions],
+                texts=[cap.lines for cap in captions],
+                leaders=[cap.leader for cap in captions])
+
+    def __len__(self):
+        return len(self.beg_ms)
+
+    def copy(self):
+        """Copy the times; the text table and leaders are shared."""
+        return CaptionColumns(beg_ms=self.beg_ms, end_ms=self.end_ms,
+                texts=self.texts, leaders=self.leaders)
+
+    def to_captions(self):
+        """Create a list of Caption objects from the columns; the
+        caption lines are shared with the text table (and so must not be
+        modified in place)."""
+        captions = []
+        for beg_ms, end_ms, lines, leader in zip(self.beg_ms, self.end_ms,
+                self.texts, self.leaders):
+            caption = Caption()
+            caption.leader, caption.beg_ms, caption.end_ms = leader, beg_ms, end_ms
+            caption.lines = lines
+            captions.append(caption)
+        return captions
+
+    def store_times(self, captions):
+        """Write the times back into the (one-to-one) Caption objects."""
+        for caption, beg_ms, end_ms in zip(captions, self.beg_ms, self.end_ms):
+            caption.beg_ms, caption.end_ms = beg_ms, end_ms
+
+    def shift(self, delay_ms):
+        """Add delay_ms to every begin/end time."""
+        self.beg_ms = array(self.TYPECODE, [ms + delay_ms for ms in self.beg_ms])
+        self.end_ms = array(self.TYPECODE, [ms + delay_ms for ms in self.end_ms])
+
+    def clip_negative(self):
+        """Clip negative begin times to zero (for captions ending at/after zero).
+        Returns: indexes of the captions wholly before zero (i.e., lost)
+        """
+        lost = [idx for idx, ms in enumerate(self.end_ms) if ms < 0]
+        self.beg_ms = array(self.TYPECODE, [0 if beg_ms < 0 <= end_ms else beg_ms
+                for beg_ms, end_ms in zip(self.beg_ms, self.end_ms)])
+        return lost
+
+    def delete(self, idxs):
+        """Remove the captions at the given indexes."""
+        if not idxs:
+            return
+        doomed = set(idxs)
+        keeps = [idx for idx in range(len(self)) if idx not in doomed]
+        self.beg_ms = array(self.TYPECODE, [self.beg_ms[idx] for idx in keeps])
+        self.end_ms = array(self.TYPECODE, [self.end_ms[idx] for idx in keeps])
+        self.texts = [self.texts[idx] for idx in keeps]
+        self.leaders = [self.leaders[idx] for idx in keeps]
+
+    def apply_formula(self, lri, bot=0, top=None):
+        """Map times in [bot, top) per a linear regression formula,
+        ms => ms + intercept + slope*ms."""
+        top = len(self) if top is None else top
+        intercept, slope = lri.intercept, lri.slope
+        self.beg_ms[bot:top] = array(self.TYPECODE, [int(round(ms + intercept + slope*ms))
+                for ms in self.beg_ms[bot:top]])
+        self.end_ms[bot:top] = array(self.TYPECODE, [int(round(ms + intercept + slope*ms))
+                for ms in self.end_ms[bot:top]])
+
 class CaptionList:
     """TBD"""
     CHARFIXES = {'¶': '♪'}
@@ -182,6 +271,12 @@ class CaptionList:
         self.ads = []
         self.fixed_char_cnt = 0
         self.delay_cnt = 0
+        # text-processing results that depend only on the caption texts;
+        # shared by the copies made while analyzing (see share_memo())
+        self.memo = SimpleNamespace(words={}, ads={}, phrases=None)
+        # if known (e.g., from speech-to-text), the exact timings of the
+        # words as (capno, beg_ms, end_ms, word) (see load_timed_words())
+        self.timed_words = None
         self.trans_table = str.maketrans(''.join(CaptionList.CHARFIXES.keys()),
                 ''.join(CaptionList.CHARFIXES.values()))
         self.limited_pats = [re.compile(pattern, re.IGNORECASE)
@@ -194,14 +289,108 @@ class CaptionList:
         if isinstance(srt_file, list):
             self.captions = srt_file
             return
+        if isinstance(srt_file, CaptionColumns):
+            self.captions = srt_file.to_captions()
+            return
 
-        if isinstance(srt_file, str):
-            with open(srt_file, 'r', encoding = 'utf-8', errors='ignore') as srt:
-                lines = srt.readlines()
-        else:
-            lines = srt_file.readlines()
-        while lines:
-            self._get_next(lines)
+        self.captions = list(self.parse_captions(srt_file))
+
+    def to_columns(self):
+        """Return the compact, columnar form of the captions."""
+        return CaptionColumns.from_captions(self.captions)
+
+    def load_timed_words(self, words_path):
+        """Load the word timings written by "video2srt --words" (lines of
+        "capno beg_ms end_ms word"); returns True if loaded."""
+        timed_words = []
+        try:
+            with open(words_path, 'r', encoding='utf-8', errors='ignore') as fh:
+                for line in fh:
+                    fields = line.split(maxsplit=3)
+                    if len(fields) == 4:
+                        timed_words.append((int(fields[0]), int(fields[1]),
+                            int(fields[2]), fields[3].strip()))
+        except Exception as exc:
+            lg.tr2('cannot load timed words:', words_path, exc)
+            return False
+        self.timed_words = timed_words
+        return True
+
+    ARTIFACT_VERSION = 3
+
+    def artifact_key(self, srt_path):
+        """Return the key validating a saved analysis artifact of the SRT
+        file: its mod time and size, those of its .words file (if any),
+        plus the ad patterns applied."""
+        stat = os.stat(srt_path)
+        try:
+            words_stat = os.stat(os.path.splitext(srt_path)[0] + '.words')
+            words_key = (words_stat.st_mtime_ns, words_stat.st_size)
+        except OSError:
+            words_key = None
+        return (stat.st_mtime_ns, stat.st_size, words_key,
+                tuple(pat.pattern for pat in self.limited_pats),
+                tuple(pat.pattern for pat in self.global_pats))
+
+    def save_artifact(self, artifact_path, srt_path):
+        """Save the (already normalized; i.e., ads purged and repaired)
+        captions and their text-processing memo in compact binary form so
+        that load_artifact() can skip re-parsing and re-processing the
+        SRT file while unchanged."""
+        columns = self.to_columns()
+        artifact = {'version': self.ARTIFACT_VERSION,
+                'key': self.artifact_key(srt_path),
+                'beg_ms': columns.beg_ms.tobytes(), 'end_ms': columns.end_ms.tobytes(),
+                'texts': columns.texts, 'leaders': columns.leaders,
+                'anomalies': self.anomalies, 'misnum_cnt': self.misnum_cnt,
+                'purge_ads_cnt': self.purge_ads_cnt, 'fixed_char_cnt': self.fixed_char_cnt,
+                'words': [self.memo.words.get(tuple(lines), None) for lines in columns.texts],
+                'timed_words': self.timed_words,
+                'ads': {text: tuple(pat.pattern if pat else None for pat in pats)
+                        for text, pats in self.memo.ads.items()},
+                }
+        tmp_path = artifact_path + '.tmp'
+        with open(tmp_path, 'wb') as out:
+            out.write(zlib.compress(pickle.dumps(artifact,
+                    protocol=pickle.HIGHEST_PROTOCOL), 1))
+        os.replace(tmp_path, artifact_path)
+
+    @staticmethod
+    def load_artifact(artifact_path, srt_path):
+        """Return the CaptionList saved by save_artifact() if it is
+        current for the SRT file; else None."""
+        caplist = CaptionList([])
+        try:
+            with open(artifact_path, 'rb') as fh:
+                artifact = pickle.loads(zlib.decompress(fh.read()))
+            if (artifact.get('version', None) != caplist.ARTIFACT_VERSION
+                    or artifact['key'] != caplist.artifact_key(srt_path)):
+                lg.tr2('stale artifact:', artifact_path)
+                return None
+            columns = CaptionColumns(texts=artifact['texts'], leaders=artifact['leaders'])
+            columns.beg_ms.frombytes(artifact['beg_ms'])
+            columns.end_ms.frombytes(artifact['end_ms'])
+        except Exception as exc:
+            lg.tr2('cannot load artifact:', artifact_path, exc)
+            return None
+        caplist.captions = columns.to_captions()
+        caplist.anomalies = artifact['anomalies']
+        caplist.misnum_cnt = artifact['misnum_cnt']
+        caplist.purge_ads_cnt = artifact['purge_ads_cnt']
+        caplist.fixed_char_cnt = artifact['fixed_char_cnt']
+        caplist.memo.words = {tuple(lines): words for lines, words
+                in zip(artifact['texts'], artifact['words']) if words is not None}
+        caplist.timed_words = artifact['timed_words']
+        pats = {pat.pattern: pat for pat in caplist.limited_pats + caplist.global_pats}
+        caplist.memo.ads = {text: tuple(pats[pat] if pat else None for pat in patterns)
+                for text, patterns in artifact['ads'].items()}
+        return caplist
+
+    def share_memo(self, other):
+        """Adopt the text-processing memo of a caption list with the same
+        texts (e.g., the list this one was copied from)."""
+        self.memo = other.memo
+        return self
 
     def is_updated(self):
         """TBD"""
@@ -216,9 +405,41 @@ class CaptionList:
         self.fixed_char_cnt += 1 if fixed != line else 0
         return fixed
 
-    def _get_next(self, lines):
-        """Get next caption from remaining lines.
-        - Returns caption if another is found else None
+    @staticmethod
+    def iter_lines(srt_file):
+        """Yield the text lines of an SRT source one at a time (w/o reading
+        the whole source into memory).  The source may be:
+         - a path (str) which is opened as utf-8
+         - a file object opened in text or binary mode
+         - bytes/bytearray/memoryview of the file content
+         - an mmap of the file
+        Binary lines are decoded as utf-8 (ignoring errors) and lone '\\r'
+        separators are honored as text-mode files would.
+        """
+        if isinstance(srt_file, str):
+            with open(srt_file, 'r', encoding = 'utf-8', errors='ignore') as srt:
+                yield from srt
+            return
+        if isinstance(srt_file, (bytes, bytearray, memoryview)):
+            srt_file = io.BytesIO(srt_file)
+
+        while True:
+            line = srt_file.readline()
+            if not line:
+                break
+            if isinstance(line, str):
+                yield line
+                continue
+            line = line.decode('utf-8', errors='ignore')
+            if '\r' in line.rstrip('\r\n'):
+                yield from line.rstrip('\r\n').split('\r')
+            else:
+                yield line
+
+    def parse_captions(self, srt_file):
+        """Yield the captions of an SRT source in a single pass over its
+        lines (see iter_lines() for the acceptable sources).  Anomalies
+        are recorded as the captions are parsed.
         """
         def to_ms(nums):
             """ms from [hr, min, sec, ms]"""
@@ -226,10 +447,11 @@ class CaptionList:
                     int(nums[2]) + 60 * (int(nums[1]) + 60 * int(nums[0])))
 
         caption = Caption()
-        while lines:
-            line = lines.pop(0).strip()
+        matcher = Caption.begin_re_matcher
+        for line in self.iter_lines(srt_file):
+            line = line.strip()
             if caption.beg_ms is None:
-                mat = Caption.begin_re_matcher.match(line)
+                mat = matcher.match(line)
                 if mat:
                     caption.beg_ms = to_ms(mat.group(1, 2, 3, 4))
                     caption.end_ms = to_ms(mat.group(5, 6, 7, 8))
@@ -244,10 +466,11 @@ class CaptionList:
                     caption.beg_ms = None # anomally
                 else:
                     lg.tr9('caption:', vars(caption))
-                    break
+                    yield caption
+                    caption = Caption()
 
         if caption.beg_ms is not None and caption.lines:
-            self.captions.append(caption)
+            yield caption
 
     def repair(self, verbose=False, title=None):
         """TBD"""
@@ -346,23 +569,32 @@ class CaptionList:
         limit_ms = (self.ad_params.limit_s if limit_s is None else limit_s) * 1000
         save_from_ms = self.captions[0].beg_ms + limit_ms
         save_to_ms = self.captions[-1].end_ms - limit_ms
+        def first_match(pats, text):
+            for pat in pats:
+                if pat.search(text):
+                    return pat
+            return None
+
         for idx, caption in enumerate(self.captions):
             text = '\n'.join(caption.lines) + '\n'
             matched = False
-            if use_config_pats and save_from_ms < caption.beg_ms > save_to_ms:
-                for pat in self.limited_pats:
-                    if pat.search(text):
+            if use_config_pats:
+                pats = self.memo.ads.get(text, None)
+                if pats is None: # (limited, global) matching patterns
+                    pats = self.memo.ads[text] = (first_match(self.limited_pats, text),
+                            first_match(self.global_pats, text))
+                if save_from_ms < caption.beg_ms > save_to_ms:
+                    pat = pats[0]
+                    if pat:
                         lg.tr1('ad match', text)
                         self.ads.append((pat.pattern, idx))
                         matched = True
-                        break
-            if use_config_pats and not matched:
-                for pat in self.global_pats:
-                    if pat.search(text):
+                if not matched:
+                    pat = pats[1]
+                    if pat:
                         lg.tr1('ad match', text)
                         self.ads.append((pat.pattern, idx))
                         matched = True
-                        break
             if pattern and not matched:
                 if pattern.search(text):
                     lg.tr1('ad match', text)
@@ -384,22 +616,31 @@ class CaptionList:
                 caption.leader = str(idx + 1)
 
     def delay_subs(self, delay_ms):
-        """TBD"""
-        deletions = []
-        for idx, caption in enumerate(self.captions):
-            caption.beg_ms += delay_ms
-            caption.end_ms += delay_ms
-            if caption.beg_ms < 0:
-                if caption.end_ms >= 0:
-                    caption.beg_ms = 0
-                    self.delay_cnt += 1
-                else:
-                    self._add_anomaly('lost frame (negative time):', caption)
-                    deletions.insert(0, idx)
-            else:
-                self.delay_cnt += 1
+        """Shift every caption by delay_ms; captions shifted wholly
+        before zero are lost."""
+        columns = self.to_columns()
+        columns.shift(delay_ms)
+        deletions = columns.clip_negative()
+        columns.store_times(self.captions)
+        for deletion in deletions:
+            self._add_anomaly('lost frame (negative time):', self.captions[deletion])
+        self.delay_cnt += len(columns) - len(deletions)
+
+        for deletion in reversed(deletions):
+            del self.captions[deletion]
 
+    def adjust_subs(self, lri):
+        """Map every caption per a linear formula (i.e., ms => ms +
+        intercept + slope*ms); captions mapped wholly before zero are lost."""
+        columns = self.to_columns()
+        columns.apply_formula(lri)
+        deletions = columns.clip_negative()
+        columns.store_times(self.captions)
         for deletion in deletions:
+            self._add_anomaly('lost frame (negative time):', self.captions[deletion])
+        self.delay_cnt += len(columns) - len(deletions)
+
+        for deletion in reversed(deletions):
             del self.captions[deletion]
 
     @staticmethod
@@ -426,24 +667,29 @@ class CaptionList:
         B1 = B1_num / B1_den if B1_den else 0
         B0 = y_mean - (B1*x_mean)
 
-        stdev, squares_sum = 0.0, 0.0
+        squares_sum = 0.0
         for idx in range(N):
             X, Y = x[idx], y[idx]
             Ycalc = B1*X + B0
             squares_sum += (Y-Ycalc)**2
-        if N:
-            stdev = math.sqrt(squares_sum / N)
 
         num = (N * xy_sum) - (x_sum * y_sum)
         den = math.sqrt((N * xx_sum - x_sum**2) * (N * yy_sum - y_sum**2))
         R = num / den if den > 0 else 1.0
 
+        return CaptionList.make_lri(B0, B1, N, squares_sum, R,
+                x[0] if x else 0, x[-1] if x else 0, b_rnd, m_rnd)
 
+    @staticmethod
+    def make_lri(B0, B1, N, squares_sum, R, x_left, x_right, b_rnd=3, m_rnd=5):
+        """Package the linear regression result."""
+        # pylint: disable=invalid-name
+        stdev = math.sqrt(squares_sum / N) if N else 0.0
         lri = SimpleNamespace()
         lri.intercept = round(B0, b_rnd)
         lri.slope = round(B1, m_rnd)
-        lri.x_left = x[0] if x else 0
-        lri.x_right = x[-1] if x else 0
+        lri.x_left = x_left
+        lri.x_right = x_right
         lri.y_left = round(B0 + B1*lri.x_left, b_rnd)
         lri.y_right = round(B0 + B1*lri.x_right, b_rnd)
         lri.stdev = round(stdev, b_rnd+1)
@@ -665,12 +911,108 @@ class CaptionList:
 
 
 
+class SegmentRegression:
+    """Prefix sums (of x, y, xy, xx, yy) over a sequence of points so that
+    the linear regression of any contiguous segment, [bot, top), is computed
+    in constant time.  The results are the same as
+    CaptionList.linear_regression() on the segment slices (the sums of
+    integer points are exact).
+    """
+    def __init__(self, xvals, yvals):
+        self.xvals = xvals
+        self.N = min(len(xvals), len(yvals))
+        self.sx, self.sy, self.sxy, self.sxx, self.syy = [0], [0], [0], [0], [0]
+        x_sum, y_sum, xy_sum, xx_sum, yy_sum = 0, 0, 0, 0, 0
+        for idx in range(self.N):
+            X, Y = xvals[idx], yvals[idx]
+            x_sum += X
+            y_sum += Y
+            xy_sum += X*Y
+            xx_sum += X*X
+            yy_sum += Y*Y
+            self.sx.append(x_sum)
+            self.sy.append(y_sum)
+            self.sxy.append(xy_sum)
+            self.sxx.append(xx_sum)
+            self.syy.append(yy_sum)
+        self._negated = None
+
+    def negated(self):
+        """Return the (cached) regression engine for the points with y negated."""
+        if not self._negated:
+            neg = copy.copy(self)
+            neg.sy = [-val for val in self.sy]
+            neg.sxy = [-val for val in self.sxy]
+            neg._negated = self
+            self._negated = neg
+        return self._negated
+
+    def squares_sum(self, bot, top):
+        """Sum of squared residuals of the linear fit of [bot, top) only."""
+        N = top - bot
+        if N <= 0:
+            return 0.0
+        x_sum = self.sx[top] - self.sx[bot]
+        y_sum = self.sy[top] - self.sy[bot]
+        xx_dev = N * (self.sxx[top] - self.sxx[bot]) - x_sum * x_sum
+        yy_dev = N * (self.syy[top] - self.syy[bot]) - y_sum * y_sum
+        if not xx_dev:
+            return yy_dev / N
+        xy_dev = N * (self.sxy[top] - self.sxy[bot]) - x_sum * y_sum
+        return max((yy_dev * xx_dev - xy_dev * xy_dev) / (xx_dev * N), 0.0)
+
+    def lri(self, bot=0, top=None, b_rnd=3, m_rnd=5):
+        """Compute linear regression of the points in [bot, top).
+        Returns: same as CaptionList.linear_regression()
+        """
+        # pylint: disable=invalid-name
+        top = self.N if top is None else min(top, self.N)
+        bot = max(0, min(bot, top))
+        N = top - bot
+        if not N:
+            return CaptionList.make_lri(0, 0, 0, 0.0, 1.0, 0, 0, b_rnd, m_rnd)
+        x_sum = self.sx[top] - self.sx[bot]
+        y_sum = self.sy[top] - self.sy[bot]
+        xy_sum = self.sxy[top] - self.sxy[bot]
+        xx_sum = self.sxx[top] - self.sxx[bot]
+        yy_sum = self.syy[top] - self.syy[bot]
+
+        xx_dev = N * xx_sum - x_sum * x_sum  # N**2 times variance of x
+        yy_dev = N * yy_sum - y_sum * y_sum  # N**2 times variance of y
+        xy_dev = N * xy_sum - x_sum * y_sum  # N**2 times covariance
+
+        B1 = xy_dev / xx_dev if xx_dev else 0
+        B0 = y_sum / N - B1 * x_sum / N
+        if xx_dev:
+            squares_sum = (yy_dev * xx_dev - xy_dev * xy_dev) / (xx_dev * N)
+        else:
+            squares_sum = yy_dev / N
+        squares_sum = max(float(squares_sum), 0.0)
+
+        den = math.sqrt(xx_dev * yy_dev)
+        R = xy_dev / den if den > 0 else 1.0
+        return CaptionList.make_lri(B0, B1, N, squares_sum, R,
+                self.xvals[bot], self.xvals[top-1], b_rnd, m_rnd)
+
+
 class CaptionListAnalyzer(CaptionList):
     """This class enables comparing a CaptionList to a "Reference"
     CaptionList (e.g., derived from speed-to-text automatically).
 
     Normally, just call analyze() is called with the reference CapList.
     """
+    MAX_PHRASE_WORDS = 16
+    # words are interned to small integer IDs (shared by all instances so
+    # the IDs of reference and studied subtitles agree); a phrase is keyed
+    # by the integer packing its word IDs WORD_BITS apiece (so distinct
+    # phrases have distinct keys) rather than by the joined words.  The
+    # words are forgotten between pairings once more than WORD_IDS_MAX (so
+    # long-lived processes stay bounded and IDs never overflow WORD_BITS).
+    WORD_IDS = {}
+    WORD_LENS = array('l')
+    WORD_BITS = 24
+    WORD_IDS_MAX = 1 << 20
+
     def __init__(self, srt_file):
         super().__init__(srt_file)
         self.xmcaps = None      # list of matched caption objects
@@ -681,11 +1023,12 @@ class CaptionListAnalyzer(CaptionList):
         self.verbosity = 0
 
     def analyze(self, ref_caplist, video_duration, out_file=None,
-            verbosity=0, fallback_caplist=None):
+            verbosity=0, fallback_caplist=None, rift_engine=None):
         """Compare "reference" captions (conventionally with suffix .REF.srt) to these
         captions PHRASE by PHRASE.  How we do this:
         - extract the "phrases" from the reference and studied subtitles
           all the time of the reference subtitles
+        - rift_engine ('window' or 'optimal') overrides rift-params.engine
         """
         def is_better(lri, nlri, min_deltadev=None):
             if min_deltadev is None:
@@ -722,13 +1065,13 @@ class CaptionListAnalyzer(CaptionList):
                 abs(best_lri.intercept) >= lims.min_offset
                     or abs(best_lri.slope*100) >= lims.min_rate):
             lg.pr('     <<<< Doing linear adjustment ... >>>>')
-            alt_caplist = CaptionListAnalyzer(copy.deepcopy(self.captions))
+            alt_caplist = CaptionListAnalyzer(self.to_columns()).share_memo(self)
             alt_caplist.replicate_xmcaps(self.xmcaps)
             alt_caplist.adjust_by_formulas(self.formulas)
             lg.tr3('whynot:', whynot, '#formulas:', len(alt_caplist.formulas)
                     if alt_caplist.formulas else None)
             whynot = alt_caplist.best_rifts_fit(ref_caplist,
-                    'linear-adjusted', verbosity)
+                    'linear-adjusted', verbosity, rift_engine)
             lg.tr3('whynot:', whynot, '#formulas:', len(alt_caplist.formulas))
             devs[1] = int(round(alt_caplist.lri.stdev)) if alt_caplist.lri else 100000
             if is_better(best_lri, alt_caplist.lri, min_deltadev=20):
@@ -744,7 +1087,7 @@ class CaptionListAnalyzer(CaptionList):
                     or best_lri.stdev >= lims.min_dev)):
 
             lg.pr('     <<<< Looking for rifts ... >>>>')
-            new_caplist = CaptionListAnalyzer(copy.deepcopy(alt_caplist.captions))
+            new_caplist = CaptionListAnalyzer(alt_caplist.to_columns()).share_memo(self)
             new_caplist.replicate_xmcaps(alt_caplist.xmcaps)
             new_caplist.adjust_by_formulas(alt_caplist.formulas)
             rift_cnt = len(alt_caplist.formulas) -1
@@ -875,13 +1218,21 @@ class CaptionListAnalyzer(CaptionList):
         self.formulas.append(ns)
 
 
-    def best_rifts_fit(self, ref_caplist, phase, verbosity=0):
-        """Find the best fit using rifts (i.e., multiple linear fits)."""
+    def best_rifts_fit(self, ref_caplist, phase, verbosity=0, rift_engine=None):
+        """Find the best fit using rifts (i.e., multiple linear fits).
+        The rift_engine is 'window' (sliding trial segments) or 'optimal'
+        (exact penalized segmentation); if None, rift-params.engine decides.
+        """
         whynot = self.best_linear_fit(ref_caplist, phase, verbosity)
         if whynot:
             return whynot
         self.formulas = []
-        self.find_breaks(nominal_slope=self.lri.slope)
+        if rift_engine is None:
+            rift_engine = self.subshop_params.rift_params.engine
+        if rift_engine == 'optimal':
+            self.find_breaks_optimal(nominal_slope=self.lri.slope)
+        else:
+            self.find_breaks(nominal_slope=self.lri.slope)
         return None
 
 
@@ -889,6 +1240,7 @@ class CaptionListAnalyzer(CaptionList):
         """
         Verbosity: 1=lots, 0=little, -1=minimal
         """
+        self.limit_word_ids()
         xwords = self.make_wordlist()
         ywords = self.make_wordlist(ref_caplist)
 
@@ -909,10 +1261,12 @@ class CaptionListAnalyzer(CaptionList):
 
     def make_wordlist(self, ref_caplist=None):
         """TBD"""
+        if ref_caplist and ref_caplist.timed_words:
+            return self.make_timed_wordlist(ref_caplist.timed_words)
         if ref_caplist:
-            captions = ref_caplist.captions
+            captions, memo = ref_caplist.captions, ref_caplist.memo.words
         else:
-            captions = self.captions
+            captions, memo = self.captions, self.memo.words
             self.init_xmcaps() # sparse ... one-to-one with captions
 
         words = []
@@ -925,12 +1279,10 @@ class CaptionListAnalyzer(CaptionList):
         # for mcap in self.xmcaps:
             mcap = None if ref_caplist else self.xmcaps[capno]
             lg.tr8('make_wordlist(): caption:', caption)
-            raw_words, cooked_words = ' '.join(self.clear_text(caption)).lower().split(), []
-            for idx, word in enumerate(raw_words):
-                word = re.sub('^[^a-z]*', '', word)
-                word = re.sub('[^a-z]*$', '', word)
-                if word:
-                    cooked_words.append(word)
+            key = tuple(caption.lines)
+            cooked_words = memo.get(key, None)
+            if cooked_words is None:
+                cooked_words = memo[key] = self.cook_words(caption)
             if not cooked_words:
                 continue
             ms_per_word = (caption.end_ms - caption.beg_ms) / len(cooked_words)
@@ -942,6 +1294,7 @@ class CaptionListAnalyzer(CaptionList):
             for idx, cooked_word in enumerate(cooked_words):
                 word = SimpleNamespace()
                 word.word = cooked_word
+                word.wid = self.intern_word(cooked_word)
                 word.mcap = mcap
                 word.pos = idx
                 word.ms = int(round(caption.beg_ms + idx * ms_per_word))
@@ -955,40 +1308,144 @@ class CaptionListAnalyzer(CaptionList):
 
         return words
 
+    def make_timed_wordlist(self, timed_words):
+        """Make the word list from exact word timings (i.e., the times
+        are not estimated by spreading the caption's duration)."""
+        words, capno, pos = [], None, 0
+        for word_capno, beg_ms, _, raw_word in timed_words:
+            cooked_word = re.sub('[^a-z]*$', '', re.sub('^[^a-z]*', '', raw_word.lower()))
+            if not cooked_word:
+                continue
+            pos = pos + 1 if word_capno == capno else 0
+            capno = word_capno
+            word = SimpleNamespace()
+            word.word = cooked_word
+            word.wid = self.intern_word(cooked_word)
+            word.mcap = None
+            word.pos = pos
+            word.ms = beg_ms
+            words.append(word)
+        return words
+
+    @staticmethod
+    def intern_word(word):
+        """Return the integer ID of the word (assigning one if new)."""
+        wid = CaptionListAnalyzer.WORD_IDS.get(word, None)
+        if wid is None:
+            wid = len(CaptionListAnalyzer.WORD_LENS)
+            assert wid + 1 < 1 << CaptionListAnalyzer.WORD_BITS, 'too many distinct words'
+            CaptionListAnalyzer.WORD_IDS[word] = wid
+            CaptionListAnalyzer.WORD_LENS.append(len(word))
+        return wid
+
+    @staticmethod
+    def limit_word_ids():
+        """Forget the interned words if more than WORD_IDS_MAX; call only before
+        pairing captions since the IDs change.  NOTE: a memo.phrases stays valid
+        since make_phrase_keys() checks it against the words' current IDs."""
+        if len(CaptionListAnalyzer.WORD_LENS) > CaptionListAnalyzer.WORD_IDS_MAX:
+            lg.tr1('forgetting interned words:', len(CaptionListAnalyzer.WORD_LENS))
+            CaptionListAnalyzer.WORD_IDS.clear()
+            del CaptionListAnalyzer.WORD_LENS[:]
+
+    @staticmethod
+    def cook_words(caption):
+        """Return the lower-cased words of the caption w/o punctuation."""
+        raw_words = ' '.join(CaptionList.clear_text(caption)).lower().split()
+        cooked_words = []
+        for word in raw_words:
+            word = re.sub('^[^a-z]*', '', word)
+            word = re.sub('[^a-z]*$', '', word)
+            if word:
+                cooked_words.append(word)
+        return tuple(cooked_words)
+
+    @staticmethod
+    def get_phrase_breaks(words):
+        """Return the word numbers starting a new phrase because
+        of a time gap (see get_phrase_words())."""
+        return [idx for idx in range(1, len(words))
+                if words[idx].ms - words[idx-1].ms > 1000]
+
     @staticmethod
     def get_phrase_words(words, wordno):
         """TBD"""
-        max_phrase_words = 16
         phrase_words = [words[wordno]]
-        for idx in range(wordno+1, min(wordno+max_phrase_words, len(words))):
+        for idx in range(wordno+1, min(wordno+CaptionListAnalyzer.MAX_PHRASE_WORDS,
+                len(words))):
             if words[idx].ms - words[idx-1].ms > 1000:
                 break
             phrase_words.append(words[idx])
         return phrase_words
 
     def make_phrase_keys(self, words):
-        """TDB"""
+        """Return the dict of the (keys of the) distinctive phrases of
+        the words to the word number starting the phrase (or None if ambiguous).
+
+        The phrases depend only on the words and where the phrases break
+        (per time gaps); since analysis phases only adjust the times, the
+        index of the prior phase is patched near the changed breaks.
+        """
+        wordlist = [w.wid for w in words]
+        breaks = self.get_phrase_breaks(words)
+        phrases = self.memo.phrases
+        if phrases and phrases.wordlist == wordlist:
+            if phrases.breaks != breaks:
+                old_breaks, new_breaks = set(phrases.breaks), set(breaks)
+                wordnos = set()
+                for brk in old_breaks ^ new_breaks:
+                    wordnos.update(range(max(brk-self.MAX_PHRASE_WORDS+1, 0), brk))
+                touched = set()
+                for wordno in wordnos:
+                    for phrase in self.get_phrases(wordlist, wordno, old_breaks):
+                        phrases.wordnos[phrase].remove(wordno)
+                        touched.add(phrase)
+                    for phrase in self.get_phrases(wordlist, wordno, new_breaks):
+                        phrases.wordnos.setdefault(phrase, []).append(wordno)
+                        touched.add(phrase)
+                for phrase in touched:
+                    hits = phrases.wordnos[phrase]
+                    if hits:
+                        phrases.keys[phrase] = hits[0] if len(hits) == 1 else None
+                    else:
+                        del phrases.wordnos[phrase]
+                        del phrases.keys[phrase]
+                phrases.breaks = breaks
+            return phrases.keys
+
+        breakset, wordnos = set(breaks), {}
+        for idx in range(len(wordlist)):
+            for phrase in self.get_phrases(wordlist, idx, breakset):
+                wordnos.setdefault(phrase, []).append(idx)
+        # - if multiple hits, we 'None' it out to indicate multiple
+        keys = {phrase: hits[0] if len(hits) == 1 else None
+                for phrase, hits in wordnos.items()}
+        self.memo.phrases = SimpleNamespace(wordlist=wordlist, breaks=breaks,
+                wordnos=wordnos, keys=keys)
+        return keys
+
+    def get_phrases(self, wordlist, wordno, breakset):
+        """Return the keys of the distinctive phrases starting at the
+        given word number (wordlist is of word IDs)."""
         tune = self.subshop_params.phrase_params
-        rv = {}
-        for idx in range(len(words)):
-            phrase_words = self.get_phrase_words(words, idx)
-            for cnt in range(1, len(phrase_words)):
-                phrase = ' '.join([w.word for w in phrase_words[0:cnt]])
-                max_word_len = max([len(w.word) for w in phrase_words[0:cnt]])
-                # - min phrase length is 8
-                # - min phrase length is 10 with one 5-letter word
-                # - if multiple hits, we 'None' it out to indicate multiple
-                # if len(phrase) >= 10 and max_word_len >= 5:
-                if len(phrase) >= tune.min_str_len and max_word_len >= tune.min_word_len:
-                    wordno = rv.get(phrase, 'unfound')
-                    rv[phrase] = idx if isinstance(wordno, str) else None
-        if False: # for initial debugging
-            ambig_cnt = 0
-            for phrase, wordno in rv.items():
-                if wordno is None:
-                    lg.pr('phrase:', phrase, ':: [ambigous] multiple hits')
-                    ambig_cnt += 1
-            print('#keys:', len(rv), '#ambiguous:', ambig_cnt)
+        bits, word_lens = self.WORD_BITS, self.WORD_LENS
+        min_str_len, min_word_len = tune.min_str_len, tune.min_word_len
+        limit = min(wordno+self.MAX_PHRASE_WORDS, len(wordlist))
+        top = wordno + 1
+        while top < limit and top not in breakset:
+            top += 1
+        rv, phrase_key, phrase_len, max_word_len = [], 0, -1, 0
+        for wid in wordlist[wordno:top-1]:
+            phrase_key = (phrase_key << bits) | (wid + 1)
+            word_len = word_lens[wid]
+            phrase_len += word_len + 1
+            if word_len > max_word_len:
+                max_word_len = word_len
+            # - min phrase length is 8
+            # - min phrase length is 10 with one 5-letter word
+            # if len(phrase) >= 10 and max_word_len >= 5:
+            if phrase_len >= min_str_len and max_word_len >= min_word_len:
+                rv.append(phrase_key)
         return rv
 
     def correlate_xy(self, ywords, xwords_keys, xwords, verbosity):
@@ -1006,12 +1463,16 @@ class CaptionListAnalyzer(CaptionList):
             # get a list of words at idx of limited size and believed
             # to be separated by less than a second or so
             phrase_words = self.get_phrase_words(ywords, idx)
+            phrase_keys, phrase_key = [], 0
+            for yword in phrase_words[:-1]:
+                phrase_key = (phrase_key << self.WORD_BITS) | (yword.wid + 1)
+                phrase_keys.append(phrase_key)
             for cnt in range(len(phrase_words)-1, 0, -1):
-                phrase = ' '.join([w.word for w in phrase_words[0:cnt]])
-                xwordno = xwords_keys.get(phrase, None)
+                xwordno = xwords_keys.get(phrase_keys[cnt-1], None)
                 if not xwordno:
                     # lg.tr9('correlate_xy(): FAILED lookup:', phrase)
                     continue
+                phrase = ' '.join([w.word for w in phrase_words[0:cnt]])
                 for widx in range(cnt):
                     xword = xwords[xwordno + widx]
                     if xword.mcap.capno in matched_capnos:
@@ -1172,10 +1633,10 @@ class CaptionListAnalyzer(CaptionList):
     def find_breaks(self, nominal_slope):
         """TBD"""
 
-        def best_break(self, xvals, yvals, bot, top, lri):
+        def best_break(self, xvals, regr, bot, top, lri):
 
             if lri.slope < 0:
-                yvals = [-y_ms for y_ms in yvals]
+                regr = regr.negated()
             cur_bot, cur_top = bot, top
             best_value, best_mid, gap = None, 0, None # no best gap < 0 will be acceptable
             border_wid = (cur_top - cur_bot) // tune.border_div
@@ -1189,10 +1650,10 @@ class CaptionListAnalyzer(CaptionList):
                 if mid-left < tune.min_pts or right-mid < tune.min_pts:
                     continue
 
-                l_lri = self.linear_regression(xvals[bot:mid], yvals[bot:mid], b_rnd=0)
+                l_lri = regr.lri(bot, mid, b_rnd=0)
                 if abs(l_lri.slope - nominal_slope) > tune.max_slope_delta:
                     continue
-                r_lri = self.linear_regression(xvals[mid:top], yvals[mid:top], b_rnd=0)
+                r_lri = regr.lri(mid, top, b_rnd=0)
                 if abs(r_lri.slope - nominal_slope) > tune.max_slope_delta:
                     continue
 
@@ -1202,8 +1663,8 @@ class CaptionListAnalyzer(CaptionList):
 
             if best_value:
                 mid = best_mid
-                l_lri = self.linear_regression(xvals[bot:mid], yvals[bot:mid], b_rnd=0)
-                r_lri = self.linear_regression(xvals[mid:top], yvals[mid:top], b_rnd=0)
+                l_lri = regr.lri(bot, mid, b_rnd=0)
+                r_lri = regr.lri(mid, top, b_rnd=0)
                 joint_stdev = math.sqrt((l_lri.squares_sum + r_lri.squares_sum)
                         /(l_lri.N + r_lri.N))
                 if DBdumpLrAns or DEBUG:
@@ -1251,6 +1712,7 @@ class CaptionListAnalyzer(CaptionList):
         tune = self.subshop_params.rift_params
         # print('tune:', vars(tune))
         xvals, yvals = self.make_xyvals()
+        regr = SegmentRegression(xvals, yvals) # O(1) regression of any segment
 
         gap_positions = [(0, 0, 0, 0)]
         # ans_whole = self.linear_regression(xvals, yvals, b_rnd=0)
@@ -1265,11 +1727,11 @@ class CaptionListAnalyzer(CaptionList):
         while True:
             if DBdumpLrAns or DEBUG:
                 print('bot:', bot, 'top:', top)
-            lri = self.linear_regression(xvals[bot:top], yvals[bot:top], b_rnd=0)
+            lri = regr.lri(bot, top, b_rnd=0)
             if abs(lri.y_right - lri.y_left) < 300: # don't bother trying
                 stdev, o_stdev, pos, gap = 0, 0, 0, None
             else:
-                stdev, o_stdev, pos, gap = best_break(self, xvals, yvals, bot, top, lri)
+                stdev, o_stdev, pos, gap = best_break(self, xvals, regr, bot, top, lri)
             # compute next bot
             bot = bot + int(round(section_len
                     * (tune.border_div-3)/tune.border_div))
@@ -1291,7 +1753,7 @@ class CaptionListAnalyzer(CaptionList):
             if idx < len(gap_positions) - 1:
                 next_gap = gap_positions[idx+1][0]
                 bot, top = gap, next_gap
-                lri = self.linear_regression(xvals[bot:top], yvals[bot:top], b_rnd=0)
+                lri = regr.lri(bot, top, b_rnd=0)
                 # self.print_lri(lri, prefix='SEGMENT:')
                 points += lri.N
                 squares_sum += lri.squares_sum
@@ -1301,6 +1763,86 @@ class CaptionListAnalyzer(CaptionList):
 #                   int(round(math.sqrt(squares_sum/points))))
 
 
+    @staticmethod
+    def noise_variance(yvals):
+        """Robust estimate of the point noise variance from the median
+        absolute successive difference (insensitive to rifts and slope)."""
+        diffs = [abs(yvals[idx+1] - yvals[idx]) for idx in range(len(yvals)-1)]
+        if not diffs:
+            return 1.0
+        sigma = 1.4826 * statistics.median(diffs) / math.sqrt(2)
+        return max(sigma, 1.0)**2
+
+    def find_breaks_optimal(self, nominal_slope):
+        """Find the rifts by solving the penalized k-segment least-squares
+        problem exactly in one pass (i.e., PELT: optimal partitioning with
+        pruning).  Each segment has at least rift-params.min-pts points, and
+        each rift costs rift-params.rift-penalty * noise-variance * ln(#pts).
+        Afterwards, the segments are merged where they violate the slope
+        limits (max-slope-delta and max-parallel-delta).
+        """
+        # pylint: disable=too-many-locals
+        tune = self.subshop_params.rift_params
+        xvals, yvals = self.make_xyvals()
+        regr = SegmentRegression(xvals, yvals)
+        npts = len(xvals)
+        min_pts = max(tune.min_pts, 2)
+        penalty = tune.rift_penalty * self.noise_variance(yvals) * math.log(max(npts, 2))
+
+        # best[top] is the least penalized cost of the points [0, top) and
+        # last[top] is where the final segment of that solution starts.
+        best, last = [-penalty] + [None] * npts, [0] * (npts + 1)
+        starts, doomed, doomed_at = [], set(), {}
+        for top in range(min_pts, npts + 1):
+            newbie = top - min_pts
+            if newbie == 0 or newbie >= min_pts:
+                starts.append(newbie)
+            for start in doomed_at.pop(top, []):
+                starts.remove(start)
+            costs = [(best[start] + regr.squares_sum(start, top), start) for start in starts]
+            cost, start = min(costs)
+            best[top], last[top] = cost + penalty, start
+            # a start that cannot beat a rift at 'top' can never win once
+            # 'top' itself may start a segment (i.e., min_pts points later)
+            for start_cost, start in costs:
+                if start_cost > best[top] and start not in doomed:
+                    doomed.add(start)
+                    doomed_at.setdefault(top + min_pts, []).append(start)
+
+        segs, top = [], npts
+        while top > 0 and npts >= min_pts:
+            segs.insert(0, [last[top], top])
+            top = last[top]
+        if not segs:
+            segs = [[0, npts]]
+
+        def merge_cost(idx): # added squares_sum of merging segs[idx] and segs[idx+1]
+            (bot, mid), (_, top) = segs[idx], segs[idx+1]
+            return (regr.squares_sum(bot, top) - regr.squares_sum(bot, mid)
+                    - regr.squares_sum(mid, top))
+
+        # merge segments that violate the slope limits (worst first)
+        while len(segs) > 1:
+            lris = [regr.lri(bot, top, b_rnd=0) for bot, top in segs]
+            merge, worst = None, 0.0  # merge is left index of the pair to merge
+            for idx, lri in enumerate(lris):
+                excess = abs(lri.slope - nominal_slope) - tune.max_slope_delta
+                if excess > worst:
+                    worst = excess
+                    merge = idx - 1 if idx == len(segs) - 1 or (
+                            idx and merge_cost(idx-1) <= merge_cost(idx)) else idx
+                excess = abs(lri.slope - lris[idx-1].slope) - tune.max_parallel_delta
+                if idx and excess > worst:
+                    merge, worst = idx - 1, excess
+            if merge is None:
+                break
+            segs[merge][1] = segs[merge+1][1]
+            del segs[merge+1]
+
+        lg.tr1('optimal rifts:', [bot for bot, _ in segs[1:]], 'penalty:', int(penalty))
+        for bot, top in segs:
+            self._add_formula(bot, top, regr.lri(bot, top, b_rnd=0))
+
     def adjust_by_formulas(self, formulas):
         """TBD"""
 
@@ -1340,25 +1882,30 @@ class CaptionListAnalyzer(CaptionList):
             rifts[idx] = pick_best_rift1(low, high)
 
 
+        # next, find the caption number where each formula takes effect
+        # (a formula takes effect at least one caption after its predecessor)
+        starts, start = [0], -1
+        for rift in rifts[:-1]:
+            start = max(rift, start + 1)
+            starts.append(min(start, len(self.captions)))
+        starts.append(len(self.captions))
+
         # finally, adjust the captions per the formula while honoring the rifts
-        rift_idx, formula = 0, formulas[0]
-        self.print_lri(formula.lri, prefix='=>               ')
-        for idx, caption in enumerate(self.captions):
-            if idx >= rifts[rift_idx]:
-                rift_idx += 1
-                formula, oformula = formulas[rift_idx], formulas[rift_idx-1]
-                lri, olri = formula.lri, oformula.lri
-                delta_ms = (adjust_ms(caption.beg_ms, lri)
-                            - adjust_ms(caption.beg_ms, olri))
-                caption.beg_ms = adjust_ms(caption.beg_ms, lri)
-                caption.end_ms = adjust_ms(caption.end_ms, lri)
-                cap_str = caption.mini_str()
-                lg.pr(f'=> {cap_str} <<{"="*max(0,58-len(cap_str))} {delta_ms}ms rift')
-                self.print_lri(lri, prefix='=>               ')
-            else:
-                lri = formula.lri
-                caption.beg_ms = adjust_ms(caption.beg_ms, lri)
-                caption.end_ms = adjust_ms(caption.end_ms, lri)
+        columns, rift_deltas = self.to_columns(), []
+        for idx, formula in enumerate(formulas):
+            bot, top = starts[idx], starts[idx+1]
+            if idx and bot < top:
+                beg_ms = columns.beg_ms[bot]
+                rift_deltas.append((bot, formula.lri, adjust_ms(beg_ms, formula.lri)
+                        - adjust_ms(beg_ms, formulas[idx-1].lri)))
+            columns.apply_formula(formula.lri, bot, top)
+        columns.store_times(self.captions)
+
+        self.print_lri(formulas[0].lri, prefix='=>               ')
+        for capno, lri, delta_ms in rift_deltas:
+            cap_str = self.captions[capno].mini_str()
+            lg.pr(f'=> {cap_str} <<{"="*max(0,58-len(cap_str))} {delta_ms}ms rift')
+            self.print_lri(lri, prefix='=>               ')
 
 
     def print_lri(self, lri, indent=0, prefix=None):
@@ -1411,7 +1958,11 @@ class SubFixer:
                 help='word-by-word analysis of reference .srt to synced_srt_file only')
         parser.add_argument('-d', '--duration', type=float, default=None,
                 help="specify video duration in seconds")
-        parser.add_argument('srt_files', nargs='+', help='list pairs of delay and SRT file')
+        parser.add_argument('--rift-engine', choices=('window', 'optimal'), default=None,
+                help='override the configured rift search engine for --analyze')
+        parser.add_argument('--benchmark', type=int, default=None, metavar='CAPTION_CNT',
+                help='time parsing a synthesized SRT with so many captions')
+        parser.add_argument('srt_files', nargs='*', help='list pairs of delay and SRT file')
         return parser.parse_args(args)
 
 
@@ -1497,6 +2048,32 @@ class SubFixer:
                 self.do_one_file(delay_ms=0, srt_file=srt_file)
         return bool(caplist.ads)
 
+    @staticmethod
+    def benchmark(caption_cnt):
+        """Time parsing a synthesized SRT file of the given number of captions
+        from each of the acceptable sources (path, file, bytes, mmap)."""
+        import mmap
+        import tempfile
+        import time
+        caplist = []
+        for idx in range(caption_cnt):
+            Caption().set(beg_s=idx*3.0, end_s=idx*3.0+2.5,
+                    text=f'Caption number {idx} says\nsomething on two lines', caplist=caplist)
+        with tempfile.NamedTemporaryFile(suffix='.srt') as tmp:
+            Caption.write_to_file(tmp.name, caplist)
+            with open(tmp.name, 'rb') as raw:
+                data = raw.read()
+            lg.pr(f'benchmark: {caption_cnt} captions in {len(data)} bytes')
+            for source in ('path', 'file', 'bytes', 'mmap'):
+                with open(tmp.name, 'r', encoding='utf-8', errors='ignore') as srt, \
+                        mmap.mmap(srt.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    src = {'path': tmp.name, 'file': srt, 'bytes': data, 'mmap': mapped}[source]
+                    start = time.time()
+                    parsed = CaptionList(src)
+                    elapsed = time.time() - start
+                lg.pr(f'  {source:>5}: {len(parsed.captions)} captions'
+                        f' in {elapsed*1000:.1f}ms')
+
 def runner(argv):
     """
     SubFixer.py [H] - fixes subtitle errors (e.g., overlaps), removes ads,
@@ -1506,6 +2083,9 @@ def runner(argv):
     opts = SubFixer.parse_args(argv)
     fixer = SubFixer(opts)
     lg.setup(level=opts.log_level)
+    if opts.benchmark:
+        SubFixer.benchmark(opts.benchmark)
+        return
     delay_ms = 0
     orig_caplist = None  # any subs for compare() or reference subs for analyze()
 
@@ -1527,7 +2107,8 @@ def runner(argv):
             elif opts.analyze and orig_caplist:
                 compare_str = fixer.caplist.analyze(orig_caplist,
                         opts.duration, opts.temp_file,
-                        verbosity=1 if opts.verbose else 0)
+                        verbosity=1 if opts.verbose else 0,
+                        rift_engine=opts.rift_engine)
                 lg.pr(compare_str)
                 sys.exit(0)
             elif opts.compare or opts.analyze:
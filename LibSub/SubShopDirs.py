@@ -45,6 +45,19 @@ log_d = _resolve_dir('SUBSHOP_LOG_D', '~/.cache/subshop')
 model_d = _resolve_dir('SUBSHOP_MODEL_D', '~/.cache/subshop')
 root_d = _resolve_root('SUBSHOP_ROOT_D', None)
 
+def get_stt_socket():
+    """Return the path of the socket of the speech-to-text service
+    (i.e., "video2srt --serve")."""
+    return os.path.join(cache_d, 'video2srt.sock')
+
+def get_index_db():
+    """Return the path of the SQLite library index (see LibraryIndex)."""
+    return os.path.join(cache_d, 'library-index.sqlite')
+
+def get_listings_db():
+    """Return the path of the SQLite cache of folder listings (see DirListings)."""
+    return os.path.join(cache_d, 'dir-listings.sqlite')
+
 
 def runner(argv):
     """TBD"""
@@ -87,6 +87,9 @@ class VideoMover:
                         os.unlink(nsubcachepath)
                     os.link(nsubtpath, nsubcachepath)
 
+        if ok:
+            self.adopt_replaced(nvideopath)
+
         if ok and not self.subtpaths and ConfigSubshop.get_params().srt_auto_download:
             if self.dry_run or self.inhibit_download:
                 lg.pr('+', f'{self.would} subshop dos "{nvideopath}" # if no internal subs')
@@ -100,6 +103,20 @@ class VideoMover:
                     lg.pr('\n\n')
         return ok
 
+    def adopt_replaced(self, nvideopath):
+        """If the moved video replaces another release of the same episode (or
+        movie) whose audio matches, then reuse its reference and downloads
+        (see SubCache.migrate_from_replaced()); the replaced video is left as is."""
+        if not ConfigSubshop.get_params().release_swap_params.enabled:
+            return
+        if self.dry_run:
+            lg.pr('+', f'{self.would}reuse reference of any replaced release')
+            return
+        try:
+            SubCache(nvideopath).migrate_from_replaced()
+        except Exception as exc:
+            lg.err(f'cannot reuse reference of replaced release [{exc}]')
+
     def move_prim(self, npath, dest):
         """Move 'npath' to 'dest'.
         If returns True if no failure; else False
@@ -23,6 +23,7 @@ from LibGen.YamlDump import yaml_dump
 from LibGen.CustLogger import CustLogger as lg
 from LibSub import ConfigSubshop
 from LibSub.PlexQuery import PlexQuery
+from LibSub.DirListings import DirListings
 
 yaml = YAML()
 yaml.default_flow_style = False
@@ -242,6 +243,7 @@ class VideoFinder:
           - if store is list, the videos are put into the single list by full pathname
           - if store is dict, then the basename of the videos are put into a list per folder
           - once a folder is found with videos, do NOT go deeper
+          - folders are listed via DirListings; so, only changed folders are re-listed
         """
         def yield_new_show(folder):
             nonlocal self
@@ -254,65 +256,61 @@ class VideoFinder:
         if show_name is None:
             show_name = os.path.basename(folder)
         lg.tr5('_yield_videos_primitive:', folder, show_name)
-        basenames = os.listdir(folder)
-        prev_yield_cnt, folders = self.yield_cnt, []
+        listing = DirListings.get().list_dir(folder)
+        prev_yield_cnt = self.yield_cnt
         ok_dir = False # until it passes
-        for basename in basenames:
+        for basename in listing.videos:
             path = os.path.join(folder, basename)
-            if os.path.isfile(path) and VideoParser.has_video_ext(basename):
-                parsed = None
-                if not ok_dir:
-                    spec, spec_has_tv_sea_or_ep = self.spec, False
-                    if spec and (spec.season is not None or spec.episode is not None):
-                        spec_has_tv_sea_or_ep = True
-
-                    if not self.plex and spec:
-                        tv_match = False
-                        if self.is_tv_tree:
-                            if spec.title not in self._normalize(show_name):
-                                return
-                            tv_match = True
-                        elif self.is_unk_tree and spec_has_tv_sea_or_ep:
-                            if spec.title not in self._normalize(show_name):
-                                return
-                            tv_match = True
-                        if tv_match and self.just_locations:
-                            if VideoParser.seasondir_pat.match(os.path.basename(folder)):
-                                yield from yield_new_show(os.path.dirname(folder))
-                            else:
-                                yield from yield_new_show(folder)
-                            return # no more from this subtree
-                    ok_dir = True
-
-                if spec and spec_has_tv_sea_or_ep:
-                    parsed = VideoParser(path)
-                    if spec.season is not None and spec.season != parsed.season:
-                        continue
-                    if spec.episode is not None and spec.episode != parsed.episode:
-                        continue
-                elif spec:
-                    parsed = VideoParser(path)
-                    # lg.db('parsed:', vars(parsed))
-                    if spec.title not in self._normalize(parsed.title):
-                        continue
-
-                self.yield_cnt += 1
-                if self.just_locations or self.every or (not self.spec and not self.plex):
-                    yield path
-                else:
+            parsed = None
+            if not ok_dir:
+                spec, spec_has_tv_sea_or_ep = self.spec, False
+                if spec and (spec.season is not None or spec.episode is not None):
+                    spec_has_tv_sea_or_ep = True
+
+                if not self.plex and spec:
+                    tv_match = False
                     if self.is_tv_tree:
-                        lst = self.candidates.get(show_name, [])
-                        lst.append(path)
-                        if len(lst) <= 1:
-                            self.candidates[show_name] = lst
-                    else:
-                        self.candidates[path] = parsed if parsed else VideoParser(path)
+                        if spec.title not in self._normalize(show_name):
+                            return
+                        tv_match = True
+                    elif self.is_unk_tree and spec_has_tv_sea_or_ep:
+                        if spec.title not in self._normalize(show_name):
+                            return
+                        tv_match = True
+                    if tv_match and self.just_locations:
+                        if VideoParser.seasondir_pat.match(os.path.basename(folder)):
+                            yield from yield_new_show(os.path.dirname(folder))
+                        else:
+                            yield from yield_new_show(folder)
+                        return # no more from this subtree
+                ok_dir = True
+
+            if spec and spec_has_tv_sea_or_ep:
+                parsed = VideoParser(path)
+                if spec.season is not None and spec.season != parsed.season:
+                    continue
+                if spec.episode is not None and spec.episode != parsed.episode:
+                    continue
+            elif spec:
+                parsed = VideoParser(path)
+                # lg.db('parsed:', vars(parsed))
+                if spec.title not in self._normalize(parsed.title):
+                    continue
 
-            elif os.path.isdir(path) and not path.endswith('.cache'):
-                folders.append(path)
+            self.yield_cnt += 1
+            if self.just_locations or self.every or (not self.spec and not self.plex):
+                yield path
+            else:
+                if self.is_tv_tree:
+                    lst = self.candidates.get(show_name, [])
+                    lst.append(path)
+                    if len(lst) <= 1:
+                        self.candidates[show_name] = lst
+                else:
+                    self.candidates[path] = parsed if parsed else VideoParser(path)
         if prev_yield_cnt == self.yield_cnt:  # go deeper only if nothing found here
-            for path in folders:
-                basename = os.path.basename(path)
+            for basename in listing.subdirs:
+                path = os.path.join(folder, basename)
                 if not VideoParser.seasondir_pat.match(basename):
                     show_name = basename
                 yield from self._yield_videos_primitive(path, show_name)